@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module cache_info
+
+Query the data cache sizes of the machine, to size the tiles of blocked
+algorithms.
+"""
+
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+
+# Used when the cache sizes cannot be queried.
+DEFAULT_CACHE_SIZES = {1: 32 * 1024, 2: 256 * 1024}
+
+
+def _parse_size(s):
+    """Convert a size string as found in /sys, e.g. '48K', to bytes."""
+    s = s.strip()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if s[-1] in units:
+        return int(s[:-1]) * units[s[-1]]
+    return int(s)
+
+
+@lru_cache
+def get_cache_sizes():
+    """Get the sizes of the data caches of cpu0.
+
+    On Linux the sizes are read from `/sys/devices/system/cpu/cpu0/cache`,
+    on macOS from `sysctl`. Instruction caches are ignored.
+
+    Returns:
+        dict mapping the cache level (1, 2, ...) to its size in bytes. Levels
+        that cannot be queried are taken from `DEFAULT_CACHE_SIZES`.
+    """
+    sizes = {}
+    for index in sorted(Path('/sys/devices/system/cpu/cpu0/cache').glob('index*')):
+        try:
+            if (index / 'type').read_text().strip() == 'Instruction':
+                continue
+            level = int((index / 'level').read_text())
+            sizes[level] = _parse_size((index / 'size').read_text())
+        except (OSError, ValueError):
+            continue
+
+    if not sizes:
+        for level, key in ((1, 'hw.l1dcachesize'), (2, 'hw.l2cachesize')):
+            try:
+                out = subprocess.run(['sysctl', '-n', key], capture_output=True, text=True, check=True).stdout
+                sizes[level] = int(out)
+            except (OSError, ValueError, subprocess.CalledProcessError):
+                continue
+
+    for level, size in DEFAULT_CACHE_SIZES.items():
+        sizes.setdefault(level, size)
+    return sizes
+
+
+def get_tile_size(itemsize, n_arrays, level=1):
+    """Number of items per array so that `n_arrays` arrays fit in a cache.
+
+    Args:
+        itemsize: size of an array item in bytes.
+        n_arrays: number of arrays that must fit in the cache together.
+        level: cache level (1 = L1, 2 = L2, ...).
+
+    Returns:
+        tile size (number of items), at least 1.
+    """
+    return max(1, get_cache_sizes()[level] // itemsize // n_arrays)
+
+
+if __name__ == '__main__':
+    print(get_cache_sizes())
+    print('-*# finished #*-')
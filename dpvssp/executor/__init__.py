@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module executor
+
+Run independent `compute_Txy` jobs in parallel.
+
+A job is a dict with keyword arguments for `compute_Txy` (experiment, T0,
+xc, yc, ufunc, ...). All jobs of a call share the pulse table `(t,x,y)`, so
+that it is shared or sent once, and produce one temperature history each.
+Jobs over different geometries take one call per pulse table.
+
+The worker processes are started with the 'spawn' method: forking a process
+in which numba's threading layer runs (e.g. after `ufunc='parallel'`)
+deadlocks the parent at exit.
+
+* `run_jobs` fans the jobs out to a `concurrent.futures` process pool on
+  this node. `(t,x,y)` and the results live in `multiprocessing.shared_memory`:
+  the workers attach to them once, tasks only carry the job index and the
+  job dict.
+* `Coordinator` hands out the same jobs to workers on other nodes, which
+  connect over a socket (`multiprocessing.connection`) and run `worker`.
+  Every worker receives `(t,x,y)` once.
+
+Both return per worker statistics, see `report`. Jobs must produce the full
+temperature history: `at`, `watch`, `reductions`, `out` and `stats` are not supported.
+"""
+
+import os
+import queue
+import socket
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+import numpy as np
+
+
+# compute_Txy arguments that change the shape or kind of its result.
+_UNSUPPORTED = ('at', 'watch', 'reductions', 'out', 'stats')
+
+
+def _check_jobs(jobs):
+    for job in jobs:
+        for name in _UNSUPPORTED:
+            if job.get(name) is not None:
+                raise ValueError(f'Arg {name} is not supported by the executor')
+
+
+def _get_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _run(t, x, y, job):
+    """Run one job, returns T and the runtime."""
+    from dpvssp.heat import compute_Txy
+    tic = perf_counter()
+    T = compute_Txy(t, x, y, **job)
+    runtime = perf_counter() - tic
+    if not isinstance(T, np.ndarray) or T.shape != x.shape:
+        raise ValueError(f'Expecting a temperature history of shape {x.shape}')
+    return T, runtime
+
+
+# start method of the worker processes, see the module docstring
+_mp_context = multiprocessing.get_context('spawn')
+
+
+def _add_stats(stats, worker_id, runtime):
+    s = stats.setdefault(worker_id, {'jobs': 0, 's': 0.})
+    s['jobs'] += 1
+    s['s'] += runtime
+
+
+def report(stats, file=sys.stdout):
+    """Print the number of jobs, the time spent in `compute_Txy` and the
+    throughput (jobs per second) of every worker."""
+    for worker_id, s in sorted(stats.items()):
+        print(f"{worker_id:>24}: {s['jobs']:4} jobs, {s['s']:.3g} s, {s['jobs'] / s['s']:.3g} jobs/s", file=file)
+
+
+# ------------------------------------------------------------------------------
+# process pool with shared memory
+# ------------------------------------------------------------------------------
+
+class _SharedArray:
+    """A numpy array in shared memory, described by a picklable tuple."""
+    def __init__(self, shape, dtype, name=None):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self.shm = SharedMemory(name=name, create=name is None, size=size if name is None else 0)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.descriptor = (tuple(shape), dtype.str, self.shm.name)
+
+
+# arrays of the worker processes, attached by _attach
+_worker_arrays = None
+
+
+def _attach(descriptors):
+    """Pool initializer: attach to the shared arrays."""
+    global _worker_arrays
+    _worker_arrays = [_SharedArray(shape, dtype, name) for shape, dtype, name in descriptors]
+
+
+def _run_shared(index, job):
+    t, x, y, T = (shared.array for shared in _worker_arrays)
+    T[index], runtime = _run(t, x, y, job)
+    return _get_worker_id(), index, runtime
+
+
+def run_jobs(t, x, y, jobs, n_workers=None):
+    """Run `compute_Txy(t, x, y, **job)` for all jobs in a process pool.
+
+    Args:
+        t, x, y: the pulse table (y must be an array).
+        jobs: list of dicts with keyword arguments for `compute_Txy`.
+        n_workers: number of worker processes, None for the number of cores.
+
+    Returns:
+        T: array of shape (n_jobs, n_pulses), T[k] is the result of jobs[k].
+        stats: dict with per worker statistics, see `report`.
+    """
+    _check_jobs(jobs)
+    n_pulses = len(x)
+    shared = [_SharedArray(a.shape, a.dtype) for a in (t, x, y)]
+    for s, a in zip(shared, (t, x, y)):
+        s.array[:] = a
+    # the result dtype is that of compute_Txy, float64 for precision='mixed'
+    result_dtype = np.float64 if any(job.get('precision') == 'mixed' for job in jobs) else t.dtype
+    shared.append(_SharedArray((len(jobs), n_pulses), result_dtype))
+    stats = {}
+    try:
+        with ProcessPoolExecutor( max_workers=n_workers, mp_context=_mp_context, initializer=_attach
+                                , initargs=([s.descriptor for s in shared],)
+                                ) as pool:
+            futures = [pool.submit(_run_shared, index, job) for index, job in enumerate(jobs)]
+            for future in futures:
+                worker_id, index, runtime = future.result()
+                _add_stats(stats, worker_id, runtime)
+        T = shared[-1].array.copy()
+    finally:
+        for s in shared:
+            del s.array
+            s.shm.close()
+            s.shm.unlink()
+    return T, stats
+
+
+# ------------------------------------------------------------------------------
+# socket based workers
+# ------------------------------------------------------------------------------
+
+class Coordinator:
+    """Hand out jobs to workers that connect over a socket.
+
+    Args:
+        address: (host, port) to listen on. Port 0 picks a free port, see
+            `self.address`.
+        authkey: bytes, shared secret of the coordinator and the workers.
+            Default: random, see `self.authkey`.
+    """
+    def __init__(self, address=('localhost', 0), authkey=None):
+        self.authkey = authkey if authkey is not None else os.urandom(16)
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        # Listener.accept has no timeout: connections are accepted by a
+        # background thread and handed over through a queue
+        self._connections = queue.Queue()
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # closed
+                return
+            except Exception:
+                # e.g. a client with the wrong authkey
+                continue
+            self._connections.put(connection)
+
+    def _accept(self, n_workers, timeout):
+        """Up to n_workers connections, waiting at most timeout seconds (None
+        for no limit) for all of them."""
+        connections = []
+        deadline = None if timeout is None else perf_counter() + timeout
+        while len(connections) < n_workers:
+            try:
+                remaining = None if deadline is None else max(deadline - perf_counter(), 0.)
+                connections.append(self._connections.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return connections
+
+    def run(self, t, x, y, jobs, n_workers, timeout=None):
+        """Run the jobs on the first `n_workers` workers that connect.
+
+        Args:
+            timeout: time (s) to wait for the workers to connect, None for no
+                limit. When it expires, the jobs run on the workers that
+                connected so far.
+
+        Returns:
+            T, stats: as in `run_jobs`.
+
+        Raises:
+            TimeoutError: if no worker connected within `timeout`.
+        """
+        _check_jobs(jobs)
+        connections = self._accept(n_workers, timeout)
+        if not connections:
+            raise TimeoutError(f'No worker connected within {timeout} s')
+        results = [None] * len(jobs)
+        stats = {}
+        todo = list(reversed(range(len(jobs))))
+        lock = threading.Lock()
+        errors = []
+
+        def serve(connection):
+            try:
+                connection.send(('setup', t, x, y))
+                while True:
+                    with lock:
+                        if not todo or errors:
+                            break
+                        index = todo.pop()
+                    connection.send(('job', index, jobs[index]))
+                    message = connection.recv()
+                    if message[0] == 'error':
+                        raise RuntimeError(f'job {index} failed on {message[1]}: {message[2]}')
+                    _, worker_id, T, runtime = message
+                    with lock:
+                        results[index] = T
+                        _add_stats(stats, worker_id, runtime)
+                connection.send(('stop',))
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                connection.close()
+
+        threads = []
+        for connection in connections:
+            thread = threading.Thread(target=serve, args=(connection,))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return np.array(results), stats
+
+    def close(self):
+        self.listener.close()
+
+
+def worker(address, authkey):
+    """Connect to the coordinator at `address` and run jobs until it sends
+    'stop'."""
+    with Client(tuple(address), authkey=authkey) as connection:
+        t = x = y = None
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                # the coordinator gave up, e.g. after a failed job
+                break
+            if message[0] == 'setup':
+                # unpickled arrays carry a copy of their dtype, compute_Txy
+                # compares dtypes by identity
+                t, x, y = (a.view(np.dtype(a.dtype.str)) for a in message[1:])
+            elif message[0] == 'job':
+                _, index, job = message
+                try:
+                    T, runtime = _run(t, x, y, job)
+                except Exception as e:
+                    connection.send(('error', _get_worker_id(), repr(e)))
+                    continue
+                connection.send(('result', _get_worker_id(), T, runtime))
+            else:
+                break
+
+
+def start_local_workers(address, authkey, n_workers):
+    """Start `n_workers` worker processes on this node.
+
+    Returns:
+        list of `multiprocessing.Process`, to be joined by the caller.
+    """
+    processes = [_mp_context.Process(target=worker, args=(address, authkey)) for w in range(n_workers)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+if __name__ == '__main__':
+    # python executor/__init__.py host port authkey_hex
+    host, port, authkey = sys.argv[1:4]
+    worker((host, int(port)), bytes.fromhex(authkey))
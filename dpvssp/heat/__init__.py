@@ -4,6 +4,7 @@
 ## Python (sub)module heat
 """
 import sys
+from functools import partial
 from wiptools import get_workspace_dir
 sys.path.insert(0, str(get_workspace_dir(__file__) / 'exponential_decay'))
 
@@ -12,28 +13,177 @@ from exponential_decay.afunc import afuncDP, afuncSP
 import dpvssp.heat.process  as process
 import dpvssp.heat.material as material
 import dpvssp.heat.geometry as geometry
+import dpvssp.heat.fastexp  as fastexp
+import dpvssp.heat.autotune as autotune
+import dpvssp.heat.engines as engines
+import dpvssp.heat.checkpoint as checkpoint
+import dpvssp.heat.memo as memo
+from dpvssp.cache_info import get_tile_size
+from dpvssp.heat.cutoff import get_contribution_windows, get_cutoff_radius, get_material_bounds, get_prefactor_bound, PulseIndex
+from dpvssp.heat.farfield import compute_farfield
+from dpvssp.heat.reltime import RelativeTimes, TimesView
 
 from numpy import pi
 import numpy as np
 try:
-    from numba import vectorize, float32, float64, guvectorize
+    from numba import vectorize, float32, float64, guvectorize, njit, prange
+    from numba import get_num_threads, set_num_threads
     has_numba = True
 except:
     has_numba = False
 
+# Number of arrays of a time tile that must fit in the cache for blocked=True.
+N_TILE_ARRAYS = 10
+
+# Largest number of entries per pulse of the pulse count matrix W of
+# compute_field(method='separable'), beyond which it uses 'gridded'.
+MAX_SEPARABLE_FILL = 4
+
+# Number of nodes per tile edge of the auxiliary lattice of
+# compute_field(method='gridded'), which bounds its memory.
+FIELD_TILE = 256
+
+
+def _get_float_type(t):
+    """The float type of the computation, taken from the times `t`."""
+    if t.dtype.type is np.float64:
+        return np.float64
+    elif t.dtype.type is np.float32:
+        return np.float32
+    else:
+        raise NotImplementedError(f"Unsupported dtype {t.dtype}")
+
+
+def _get_kernel_constants(experiment, float_type):
+    """Derived process quantities that remain constant over time.
+
+    Returns:
+        Ethpi32rho, w2
+    """
+    Eth, omega0 = process.get_Eth_omega0(experiment=experiment)
+    Ethpi32rho = float_type(2 * Eth / (pi * np.sqrt(pi) * material.rho))
+    w2         = float_type(0.5 * omega0 ** 2)
+    return Ethpi32rho, w2
+
+
+def _get_pulse_chunk(pulses, t1, x, y, xc, yc, Ethpi32rho, w2, tol):
+    """Minus the squared distance of the pulses to the probe, and the times
+    the pulses contribute to.
+
+    Returns:
+        md2, jstart, jstop: arrays over `pulses`.
+    """
+    n_pulses = len(t1)
+    xp = x[pulses]
+    yp = y[pulses] if isinstance(y, np.ndarray) else np.full_like(xp, y)
+    #########################################
+    # md2 = - ( (xi-xc)**2 + (yi-yc)**2 )   #
+    # GOTCHA! float32**2 returns a float64. #
+    # That was unexpected!                  #
+    #########################################
+    md2 = - ((xp - xc) * (xp - xc) + (yp - yc) * (yp - yc))
+    if tol:
+        jstart, jstop = get_contribution_windows(t1, pulses, md2, Ethpi32rho, w2, tol)
+    else:
+        jstart = pulses
+        jstop = np.full(len(pulses), n_pulses)
+    return md2, jstart, jstop
+
+
+def _iter_pulse_chunks(pulses, stop, chunk_size, t1, x, y, xc, yc, Ethpi32rho, w2, tol, targets=None):
+    """Iterate over the pulses before `stop` in chunks of chunk_size pulses.
+
+    Args:
+        pulses: the (increasing) indices of the pulses to visit, None for all.
+        targets: if not None, the indices of the times of T (see `at` of
+            `compute_Txy`), the windows are mapped to indices into targets.
+
+    Yields:
+        pulses, md2, jstart, jstop: of the chunk, see `_get_pulse_chunk`.
+    """
+    n = stop if pulses is None else np.searchsorted(pulses, stop)
+    for start in range(0, n, chunk_size):
+        chunk = min(start + chunk_size, n)
+        pulses_c = np.arange(start, chunk) if pulses is None else pulses[start:chunk]
+        md2, jstart, jstop = _get_pulse_chunk(pulses_c, t1, x, y, xc, yc, Ethpi32rho, w2, tol)
+        if targets is not None:
+            jstart = np.searchsorted(targets, jstart)
+            jstop = np.searchsorted(targets, jstop)
+        yield pulses_c, md2, jstart, jstop
+
+
+def _get_watch(watch):
+    """The condition of `watch` (see `compute_Txy`), as a callable
+    `condition(t, T) -> bool array`."""
+    if callable(watch):
+        return watch
+    if watch == 'clip':
+        watch = material.T_MAX
+    elif isinstance(watch, str):
+        raise ValueError(f'Unknown watch condition `{watch}`')
+    threshold = float(watch)
+    return lambda t, T: T > threshold
+
+
+def _get_targets(at, t1):
+    """The indices into `t1` of `at` (indices or times, see `compute_Txy`)."""
+    at = np.asarray(at)
+    if np.issubdtype(at.dtype, np.floating):
+        targets = np.searchsorted(t1, at)
+        if np.any(targets >= len(t1)) or np.any(t1[np.minimum(targets, len(t1) - 1)] != at):
+            raise ValueError('Times in `at` must be pulse times t[1:]')
+    else:
+        targets = at.astype(np.int64)
+        if np.any(targets < 0) or np.any(targets >= len(t1)):
+            raise ValueError(f'Indices in `at` must be in [0, {len(t1)})')
+    if np.any(np.diff(targets) <= 0):
+        raise ValueError('`at` must be increasing')
+    return targets
+
+
+def _get_exact_times(t1T, times, targets, start, stop):
+    """The times of T[start:stop], in float64 from the relative-time encoding
+    `times` if it is not None."""
+    if times is None:
+        return t1T[start:stop]
+    j = np.arange(start, stop) if targets is None else targets[start:stop]
+    return times.get_absolute(j + 1)
+
+
 def compute_Txy(t, x, y=0.0, T0=300.
                 , experiment: int = 0
                 , report_n_clipped=False
                 , ufunc=''
                 , blocked=False
                 , verbose=False
+                , n_threads=None
+                , tile_size=None
+                , xc=0.0, yc=0.0
+                , tol=None
+                , pulse_index=None
+                , material_tol=None
+                , refresh_dT=None
+                , exp_tol=None
+                , precision=None
+                , out=None
+                , chunk_size=None
+                , checkpoint_file=None
+                , checkpoint_interval=checkpoint.DEFAULT_INTERVAL
+                , resume=False
+                , at=None
+                , watch=None
+                , reductions=None
+                , stats=None
                 ):
-    """Compute the temperature rise at the origin for the time/pulse location
-    table `(t,x,y)`.
+    """Compute the temperature rise at the probe point `(xc,yc)` (default the
+    origin) for the time/pulse location table `(t,x,y)`.
 
     Args:
         t: numpy array with the times of the pulses (monotonously increasing).
-            Size = n_pulses+1.
+            Size = n_pulses+1. Or a `reltime.RelativeTimes`: the computation
+            is then done in the float type of its deltas, and the times of
+            `at` and the times passed to `watch` and `reductions` are exact
+            (float64).
         x: numpy array with the x-coordinate of the pulse locations.
             Size = n_pulses.
         y: numpy array with the y-coordinate of the pulse locations
@@ -41,11 +191,121 @@ def compute_Txy(t, x, y=0.0, T0=300.
         T0: material temperature at t=t[0]=0.
         experiment: process parameters (Eth, omega) are taken from this
             experiment.
+        ufunc: engine that computes the temperature rise: '' (numpy array
+            operations), 'ufunc', 'gufunc', 'afunc', 'fused', 'compiled',
+            'parallel', 'farfield' or 'auto'. 'auto' selects the fastest engine (and
+            `blocked`) that supports the other arguments, as timed for this
+            host by `dpvssp.heat.autotune` on first use. 'fused' is the numpy engine without temporaries:
+            every operation writes into the work arrays of the tile (with
+            `out=`), and the constant factors are folded into the polynomial
+            coefficients. 'compiled' runs the pulse loop of every time tile
+            in one serial numba kernel, without per-pulse Python overhead:
+            all pulses are applied to a chunk of the tile that fits in L1
+            before moving on to the next chunk. 'parallel' runs the entire
+            pulse loop in a multi-threaded numba kernel that splits the time
+            axis in chunks.
+            'farfield' is approximate: groups of older pulses are evaluated
+            with a Chebyshev expansion, within tolerance `tol` (see
+            `dpvssp.heat.farfield`).
+            The options that each engine supports are listed in
+            `dpvssp.heat.engines.SUPPORT`.
+        n_threads: number of threads used by `ufunc='parallel'`. None uses
+            numba's default (NUMBA_NUM_THREADS).
+        blocked: process the time axis in tiles that fit in the L2 cache.
+            Off by default: the per-pulse Python loop of the numpy engines
+            then runs once per tile (about n_tiles/2 times as many
+            iterations), which only pays off if the tiles are large
+            compared to the per-pulse overhead (see the README for timings).
+        tile_size: number of times per tile, overrides the tile size derived
+            from the cache size for `blocked=True`. Small tiles multiply the
+            per-pulse Python overhead. For `ufunc='farfield'`
+            the default is `farfield.TILE_LEAVES` leaves of the tree.
+        xc, yc: location of the probe point.
+        tol: if not None, pulse contributions that are guaranteed to be
+            smaller than tol (K) are not evaluated (see
+            `dpvssp.heat.cutoff`). Every pulse is only applied to the times
+            in its window.
+        pulse_index: a `cutoff.PulseIndex` over `(x,y)`. With `tol`, only the
+            pulses within the cutoff radius of the probe point are visited.
+            Build it once to evaluate many probe points.
+        material_tol: if not None, the material polynomials are replaced by
+            piecewise linear tables over the clipping range with a relative
+            error below material_tol (see `material.MaterialTable`). Not
+            supported by `ufunc='compiled'` and `ufunc='parallel'`.
+        refresh_dT: if not None, the material parameters at time t[j] are
+            only re-interpolated when the (clipped) temperature changed by
+            more than refresh_dT (K) since they were last evaluated.
+            `refresh_dT=0` reproduces the default results exactly. The number
+            of skipped re-evaluations is recorded in `stats` and reported if
+            `verbose`. Not supported
+            by `ufunc='compiled'`, `ufunc='parallel'` and `ufunc='farfield'`.
+        exp_tol: if not None, the exponential is evaluated with
+            `fastexp.exp` with relative tolerance exp_tol (0 for full
+            accuracy), instead of `np.exp`. Only for `ufunc=''` and
+            `ufunc='fused'`.
+        precision: None (the precision of the inputs) or 'mixed': the
+            inputs are stored and the kernel is evaluated in float32, while
+            the temperatures are accumulated in float64. Only for
+            `ufunc=''` and `ufunc='fused'`. With `ufunc='auto'`,
+            `precision='auto'` lets the autotuner choose.
+        out: if not None, array of size n_pulses in which the result is
+            stored, e.g. a memory mapped .npy file (see
+            `dpvssp.heat.pulsetable`).
+        chunk_size: if not None, bound the memory used: the time axis is
+            processed in tiles of at most chunk_size times, the pulses in
+            chunks of chunk_size, and no arrays of size n_pulses are
+            allocated (except the result, if `out` is None). The squared
+            distances and windows of the pulses are recomputed for every
+            time tile. `t`, `x` and `y` can be memory mapped (see
+            `dpvssp.heat.pulsetable`). Not supported by `ufunc='parallel'`,
+            `ufunc='farfield'` and `precision='mixed'`.
+        checkpoint_file: if not None, the state of the pulse loop (`T` and
+            the next pulse) is saved to this file every checkpoint_interval
+            seconds, from a background thread (see
+            `dpvssp.heat.checkpoint`). The checkpoint is removed when the
+            computation finishes. The time axis is processed in tiles (as
+            with `blocked`), a checkpoint only copies the tiles that changed.
+        resume: continue from the checkpoint in checkpoint_file, if there
+            is one. It must have been written by the same job (inputs and
+            options). With `refresh_dT`, the resumed run re-interpolates
+            all material parameters once, so the result may differ from an
+            uninterrupted run within the refresh tolerance. Not supported by
+            `ufunc='parallel'`, `ufunc='farfield'` and `chunk_size`.
+        at: if not None, compute T only at these times: an increasing int
+            array of indices into T, or an increasing array of pulse times
+            (items of t[1:]). Since T[j] only depends on T[j] and the pulses
+            before t[j+1], the results are identical to `T[at]` of the full
+            computation, at a cost proportional to n_pulses * len(at). Not
+            supported by `ufunc='farfield'`.
+        watch: if not None, stop as soon as a condition holds for a final
+            temperature, and return the history up to that time. The
+            condition is a threshold (K), 'clip' for the clipping limit
+            `material.T_MAX`, or a callable `watch(t, T)` returning a bool
+            array for the times `t` and final temperatures `T` of a time
+            tile. The time axis is processed in tiles (of the L2 cache size,
+            unless `blocked` or `tile_size` say otherwise), the condition is
+            checked whenever a tile is finished. Not supported by
+            `ufunc='parallel'` and `ufunc='farfield'`.
+        reductions: a `reductions.Reductions` that is updated with every
+            time tile as it is finished (up to the event, with `watch`). If
+            `chunk_size` is given and `out` is None, T is not stored and
+            the reductions are returned instead. Not supported by
+            `ufunc='parallel'` and `ufunc='farfield'`.
+        stats: if not None, a dict in which counts are recorded: with
+            `refresh_dT`, 'n_material_evaluated' and 'n_material_skipped'
+            (the (pulse, time) pairs at which the material parameters were
+            re-interpolated or reused), with `report_n_clipped`, 'n_clipped'
+            and 'n' (the clipped and all (pulse, time) pairs).
 
     Returns:
-       T: array, T[i] is the temperature at time t[i+1] due to all
-            pulses applied before t[i+1]. So T[0] is the temperature at t[1],
-            and so on.
+       T: array (`out`, if given), T[i] is the temperature at time t[i+1]
+            due to all pulses applied before t[i+1]. So T[0] is the
+            temperature at t[1], and so on. With `at`, T[m] is the
+            temperature at the m-th time of `at`.
+            With `reductions`, `chunk_size` and no `out`: the reductions.
+       event: only if `watch`, the index into T of the first time at which
+            the condition holds, or None. If not None, T is truncated after
+            the event: `T[:event + 1]`.
 
     This algorithm computes the contribution of pulse 1 to all times, then the
     contribution of pulse 2, ... After each pulse the material parameters are
@@ -56,12 +316,15 @@ def compute_Txy(t, x, y=0.0, T0=300.
     """
     # We assume that we only want to know the temperature at the pulse times
     # the algorithm can be adapted to compute at other times as well.
-    if t.dtype.type is np.float64:
-        float_type = np.float64
-    elif t.dtype.type is np.float32:
-        float_type = np.float32
-    else:
-        raise NotImplementedError(f"Unsupported dtype {t.dtype}")
+    times = None
+    if isinstance(t, RelativeTimes):
+        # The kernel is evaluated at the time t1 itself, which needs only
+        # relative precision: the engines get the times rounded once to the
+        # float type of the deltas. Exact times are taken from the encoding.
+        # Under chunk_size, the times are decoded per tile and chunk.
+        times = t
+        t = TimesView(times) if chunk_size and precision != 'mixed' else times.get_times()
+    float_type = _get_float_type(t)
 
     if not isinstance(y, np.ndarray):
         y = float_type(y)
@@ -74,16 +337,49 @@ def compute_Txy(t, x, y=0.0, T0=300.
     or not T0.dtype is t.dtype:
         raise ValueError(f'Args x, y and T0 must have the same dtype as t ({t.dtype})')
 
-    xc = float_type(0.)
-    yc = float_type(0.)
+    # the options that not every engine supports (see `engines.SUPPORT`)
+    options = engines.get_options( report_n_clipped=report_n_clipped, material_tol=material_tol
+                                 , refresh_dT=refresh_dT, exp_tol=exp_tol, precision=precision, at=at
+                                 , chunk_size=chunk_size, checkpoint_file=checkpoint_file
+                                 , watch=watch, reductions=reductions
+                                 )
+    if ufunc == 'auto':
+        selected = autotune.select( float_type, n_pulses=len(x), experiment=experiment, options=options
+                                  , allow_mixed=precision == 'auto', verbose=verbose
+                                  )
+        ufunc = selected['ufunc']
+        if not tile_size:
+            blocked = selected.get('blocked', blocked)
+        if precision == 'auto':
+            precision = selected.get('precision')
+            if precision == 'mixed':
+                options += ('precision',)
+    elif precision == 'auto':
+        raise ValueError("precision='auto' requires ufunc='auto'")
+
+    engines.check(ufunc, options)
+    if ufunc in ('compiled', 'parallel') and not has_numba:
+        raise NotImplementedError(f"ufunc='{ufunc}' requires numba")
+    if ufunc == 'farfield' and not tol:
+        raise ValueError("ufunc='farfield' requires a tolerance `tol`")
+
+    if precision is None:
+        accumulator_type = float_type
+    elif precision == 'mixed':
+        # storage and kernel evaluation in float32, T0 and T in float64
+        float_type = np.float32
+        accumulator_type = np.float64
+        t = t.astype(float_type)
+        x = x.astype(float_type)
+        y = y.astype(float_type)
+    else:
+        raise ValueError(f'Unknown precision `{precision}`')
 
     # location where we want to know the temperature
+    xc = float_type(xc)
+    yc = float_type(yc)
 
-    # Process parameters
-    Eth, omega0 = process.get_Eth_omega0(experiment=experiment)
-    # derived quantities that remain constant over time
-    Ethpi32rho = float_type(2 * Eth / (pi * np.sqrt(pi) * material.rho))
-    w2         = float_type(0.5 * omega0 ** 2)
+    Ethpi32rho, w2 = _get_kernel_constants(experiment, float_type)
 
     n_times = len(t)
     n_pulses = len(x)
@@ -91,113 +387,933 @@ def compute_Txy(t, x, y=0.0, T0=300.
     ntot = 0
 
     # if dtype not in (float, np.float64):
-    pola, polc = material.get_material_polynomials(float_type)
+    if material_tol:
+        pola, polc = material.get_material_tables(float_type, material_tol)
+    else:
+        pola, polc = material.get_material_polynomials(float_type)
 
-    # Allocate work arrays
-    _a      = np.empty_like(x)
-    _c      = np.empty_like(x)
-    _dt     = np.empty_like(x)
-    _a4dt   = np.empty_like(x)
-    _a4dtw2 = np.empty_like(x)
-    _Tclipd = np.empty_like(x)
+    t1 = TimesView(times, 1) if isinstance(t, TimesView) else t[1:]  # len(t1) == len(x), t has one item more that
 
-    t1 = t[1:]  # len(t1) == len(x), t has one item more that
+    # The times of T: indices into t1 (None for all), their number and times
+    if at is None:
+        targets = None
+        n_T = n_pulses
+        t1T = t1
+    else:
+        targets = _get_targets(at, t1 if times is None else TimesView(times, 1, exact=True))
+        n_T = len(targets)
+        t1T = t1[targets]
+
+    # With reductions, the history need not be stored (chunk_size: every
+    # tile is stored separately)
+    store_T = out is not None or reductions is None or not chunk_size
+    if not store_T:
+        T = None
+    elif out is None:
+        T = T0 * np.ones(n_T, dtype=accumulator_type)
+    else:
+        if len(out) != n_T or out.dtype.type is not accumulator_type:
+            raise ValueError(f'Arg out must have size {n_T} and dtype {np.dtype(accumulator_type)}')
+        T = out
+        if not chunk_size:
+            T[:] = T0
 
-    T = T0 * np.ones_like(x)
+    if checkpoint_file is not None:
+        # a checkpoint copies the tiles that changed, so checkpoints need
+        # tiles
+        blocked = True
+    if watch is not None:
+        condition = _get_watch(watch)
+        # T is final per time tile, so watch needs tiles
+        blocked = True
 
-    if blocked:
-        # Compute the time slices in blocks that optimize cache utilization
-        L1cache = 32 * 1024
-        blocksize = L1cache // t.dtype.itemsize // 7
-        # 7 and 8 give approximately the same performance, 6 is slightly worse.
-        nblocks = int(np.ceil(n_pulses / blocksize))
+    # The pulses to visit, None for all pulses
+    if tol and pulse_index is not None:
+        pulses = pulse_index.query(xc, yc, get_cutoff_radius(t1, Ethpi32rho, w2, tol))
+    elif chunk_size:
+        pulses = None
+    else:
+        pulses = np.arange(n_pulses)
+
+    if not chunk_size:
+        # Minus the squared distance of the pulses to the probe, and the times
+        # the pulses contribute to
+        _md2, jstart, jstop = _get_pulse_chunk(pulses, t1, x, y, xc, yc, Ethpi32rho, w2, tol)
+        if targets is not None:
+            # windows as indices into the targets
+            jstart = np.searchsorted(targets, jstart)
+            jstop = np.searchsorted(targets, jstop)
+
+    if exp_tol is None:
+        exp = np.exp
+    else:
+        exp = partial(fastexp.exp, tol=exp_tol)
+
+    if ufunc == 'fused':
+        # 4*a and c/Ethpi32rho, so that the kernel needs no extra passes for
+        # these factors (the factor 4 is exact).
+        ca, cc = material.get_material_coefficients(float_type)
+        ca4 = 4 * ca
+        ccE = cc / Ethpi32rho
+
+    if ufunc == 'compiled':
+        ca, cc = material.get_material_coefficients(float_type)
+        # chunks of the tile such that T and t1 fit in L1
+        chunksize = get_tile_size(t.dtype.itemsize, 2, level=1)
+
+    if ufunc == 'farfield':
+        compute_farfield( Ethpi32rho, w2, pola, polc, pulses, _md2, t1, T, tol
+                        , tile_size=tile_size, verbose=verbose
+                        )
+        return T
+
+    if ufunc == 'parallel':
+        # The time axis is split over the threads, every thread adds the
+        # contributions of all pulses to its own chunk of T. Since T[j] only
+        # depends on T[j] and the pulses before t1[j], this gives the same
+        # result as the serial loop and `blocked` is irrelevant.
+        ca, cc = material.get_material_coefficients(float_type)
+        n_threads_default = get_num_threads()
+        if n_threads:
+            set_num_threads(n_threads)
+        try:
+            # At least 8 chunks per thread for load balancing, but not larger
+            # than what fits T and t1 in L1.
+            chunksize = int(np.ceil(n_T / (8 * get_num_threads())))
+            chunksize = min(chunksize, get_tile_size(t.dtype.itemsize, 2, level=1))
+            _Txy_parallel(Ethpi32rho, w2, ca, cc, _md2, t1T, T, jstart, jstop, chunksize)
+        finally:
+            set_num_threads(n_threads_default)
+        return T
+
+    if chunk_size:
+        blocksize = min(tile_size or chunk_size, chunk_size, n_T)
+    elif tile_size:
+        blocksize = min(tile_size, n_T)
+    elif blocked:
+        # Tiles of the time axis such that the arrays that are traversed for
+        # every pulse (T, t1, _Tclipd, _a, _c, _a4dt, _a4dtw2 and the
+        # temporaries of Trise) fit in L2.
+        blocksize = min(get_tile_size(t.dtype.itemsize, N_TILE_ARRAYS, level=2), n_T)
     else:
         # only one block
+        blocksize = n_T
+    nblocks = int(np.ceil(n_T / blocksize))
+
+    # Allocate work arrays, one item for every time in a tile
+    _a      = np.empty(blocksize, dtype=float_type)
+    _c      = np.empty(blocksize, dtype=float_type)
+    _a4dt   = np.empty(blocksize, dtype=float_type)
+    _a4dtw2 = np.empty(blocksize, dtype=float_type)
+    _Tclipd = np.empty(blocksize, dtype=float_type)
+    if refresh_dT is not None:
+        # clipped temperature at which _a and _c were last evaluated
+        _Tlast = np.empty(blocksize, dtype=float_type)
+        n_evaluated = 0
+        n_skipped = 0
+    if chunk_size:
+        # the time tile of T, written to T when the tile is finished
+        _Tb = np.empty(blocksize, dtype=accumulator_type)
+
+    # index of the first time the watch condition holds
+    event = None
+
+    # Position in the pulse loop to start from: time tile and pulse
+    iblock0, k0 = 0, 0
+    checkpointer = None
+    if checkpoint_file is not None:
+        # the job, so that a checkpoint is never resumed by another one
+        arrays = ((t,) if times is None else (times.origins, times.deltas)) \
+               + (x, y if isinstance(y, np.ndarray) else np.asarray(y))
+        key = memo.get_key( 'compute_Txy', arrays if targets is None else arrays + (targets,)
+                          , T0=float(T0), experiment=experiment, ufunc=ufunc, blocksize=blocksize
+                          , xc=float(xc), yc=float(yc), tol=tol, pulse_index=pulse_index is not None
+                          , material_tol=material_tol
+                          , refresh_dT=refresh_dT, exp_tol=exp_tol, precision=precision
+                          )
+        state = checkpoint.load(checkpoint_file, key) if resume else None
+        if state is not None:
+            T[:], iblock0, k0, _ = state
+            if reductions is not None:
+                # the tiles that were final already
+                reductions.update( _get_exact_times(t1T, times, targets, 0, iblock0 * blocksize)
+                                 , T[:iblock0 * blocksize]
+                                 )
+            if verbose:
+                print(f"resuming from time tile {iblock0}, pulse {k0}", file=sys.stderr)
+        checkpointer = checkpoint.Checkpointer( checkpoint_file, key, T, blocksize
+                                              , interval=checkpoint_interval, resume=state is not None
+                                              )
+
+    # Loop over the (pulse tile x time tile) pairs of the lower triangular
+    # pulse/time matrix, time tiles in the outer loop. For every time T[j]
+    # the pulses are thus still applied in order and the material parameters
+    # re-interpolated after each pulse, so the result does not depend on the
+    # tile size.
+    for iblock in range(iblock0, nblocks):
+        blockstart = iblock * blocksize
+        blockstop = min(blockstart + blocksize, n_T)
+        # the pulses before pstop contribute to this tile
+        pstop = blockstop if targets is None else targets[blockstop - 1] + 1
+        # Views of the time tile. Slices are relative to blockstart.
+        if chunk_size:
+            Tb = _Tb[:blockstop - blockstart]
+            Tb[:] = T0
+        else:
+            Tb = T[blockstart:blockstop]
+        t1b = t1T[blockstart:blockstop]
+        if refresh_dT is not None:
+            # nothing evaluated yet in this tile
+            _Tlast[:] = np.inf
+
+        if chunk_size:
+            chunks = _iter_pulse_chunks( pulses, pstop, chunk_size
+                                       , t1, x, y, xc, yc, Ethpi32rho, w2, tol, targets
+                                       )
+        else:
+            chunks = ((pulses, _md2, jstart, jstop),)
+
+        for pulses_c, _md2_c, jstart_c, jstop_c in chunks:
+            if ufunc == 'compiled':
+                if checkpointer is not None and checkpointer.is_due():
+                    checkpointer.save(T, iblock, 0)
+                # the pulse loop of the tile in one kernel, windows relative
+                # to the tile
+                n_k = np.searchsorted(pulses_c, pstop)
+                _Txy_compiled( Ethpi32rho, w2, ca, cc, _md2_c[:n_k], t1b, Tb
+                             , jstart_c[:n_k] - blockstart, jstop_c[:n_k] - blockstart, chunksize
+                             )
+                continue
+
+            for k in range(k0 if iblock == iblock0 else 0, np.searchsorted(pulses_c, pstop)):
+                if checkpointer is not None and checkpointer.is_due():
+                    # pulses before k are applied
+                    checkpointer.save(T, iblock, k)
+                i = pulses_c[k]
+                if verbose and i%1000==0:
+                    print(f"{i}/{pstop}", file=sys.stderr, flush=True)
+                # slice of of times in this tile pulse i contributes to
+                slice = np.s_[max(jstart_c[k] - blockstart, 0):min(jstop_c[k], blockstop) - blockstart]
+                if slice.start >= slice.stop:
+                    continue
+
+                # Clip the temperature
+                if report_n_clipped:
+                    n_clipped, n = (Tb[slice] > 1073).sum(), len(Tb[slice])
+                    print(f"pulses>={i}, t={t[i + 1]}: n_clipped = {n_clipped}/{n} = {100 * n_clipped / n:5.1f}%")
+                    ntot_clipped += n_clipped
+                    ntot += n
+
+                np.clip(Tb[slice], 0, 1073, out=_Tclipd[slice])
+
+                if ufunc == 'fused':
+                    _Trise_fused(ca4, ccE, w2, _md2_c[k], t1b[slice], Tb[slice]
+                                , _Tclipd[slice], _a[slice], _c[slice], exp
+                                )
+                    continue
+
+                # Interpolate the material parameters from the clipped temperatures
+                if refresh_dT is None:
+                    _a[slice] = pola(_Tclipd[slice])
+                    _c[slice] = polc(_Tclipd[slice])
+                else:
+                    # only where the temperature changed meaningfully
+                    Tclipd = _Tclipd[slice]
+                    stale = np.abs(Tclipd - _Tlast[slice]) > refresh_dT
+                    n_stale = np.count_nonzero(stale)
+                    if 2 * n_stale > len(Tclipd):
+                        # mostly stale, contiguous evaluation is cheaper
+                        _Tlast[slice] = Tclipd
+                        _a[slice] = pola(Tclipd)
+                        _c[slice] = polc(Tclipd)
+                    elif n_stale:
+                        stale = np.flatnonzero(stale)
+                        Tstale = Tclipd[stale]
+                        _Tlast[slice][stale] = Tstale
+                        _a[slice][stale] = pola(Tstale)
+                        _c[slice][stale] = polc(Tstale)
+                    n_evaluated += n_stale
+                    n_skipped += len(Tclipd) - n_stale
+
+                md2 = _md2_c[k]
+
+                # Compute temperature rise of pulse i at all subsequent times
+                if not ufunc:
+                    # simple numpy array operations (involving temporary arrays.)
+                    _a4dt[slice] = (4 * _a[slice]) * t1b[slice]
+                    _a4dtw2[slice] = _a4dt[slice] + w2
+
+                    Trise = ((Ethpi32rho / _c[slice])
+                             / (np.sqrt(_a4dt[slice]) * _a4dtw2[slice])
+                             ) * exp(md2 / _a4dtw2[slice]
+                                        # - (z-z0)**2 / alpha4tx # assuming z=z0
+                                        )
+                    Tb[slice] += Trise
+
+                elif ufunc == 'ufunc':
+                    # use numpy universal func by numba
+                    Trise = ufunc_Trise( Ethpi32rho, w2
+                                        , _a[slice], _c[slice]
+                                        , md2
+                                        , t1b[slice]
+                                        )
+                    Tb[slice] += Trise
+
+                elif ufunc == 'gufunc':
+                    gufunc_Trise( Ethpi32rho, w2
+                                , _a[slice], _c[slice]
+                                , md2
+                                , t1b[slice]
+                                , Tb[slice]
+                                )
+
+                elif ufunc == 'afunc':
+                    if float_type is np.float64:
+                        afuncDP( Ethpi32rho, w2, _a[slice], _c[slice], md2, t1b[slice]
+                                , Tb[slice]
+                                )
+                    elif float_type is np.float32:
+                        afuncSP( Ethpi32rho, w2, _a[slice], _c[slice], md2, t1b[slice]
+                                , Tb[slice]
+                                )
+                    else:
+                        raise NotImplementedError(f'Unknown float_type: {float_type}')
+
+                else:
+                    raise NotImplementedError(f'ufunc `{ufunc}` not supported')
+
+        if chunk_size and store_T:
+            T[blockstart:blockstop] = Tb
+
+        # The tile is final
+        if watch is not None or reductions is not None:
+            tb = _get_exact_times(t1T, times, targets, blockstart, blockstop)
+        if watch is not None:
+            hits = np.flatnonzero(condition(tb, Tb))
+            if len(hits):
+                event = blockstart + hits[0]
+                if reductions is not None:
+                    reductions.update(tb[:hits[0] + 1], Tb[:hits[0] + 1])
+                if store_T:
+                    T = T[:event + 1]
+                break
+        if reductions is not None:
+            reductions.update(tb, Tb)
+
+    if checkpointer is not None:
+        checkpointer.close()
+        checkpoint.remove(checkpoint_file)
+        if verbose:
+            print(f"checkpoints written: {checkpointer.n_written}, skipped: {checkpointer.n_skipped}", file=sys.stderr)
+    if report_n_clipped:
+        print(f"ntot_clipped = {ntot_clipped}/{ntot} = {100 * ntot_clipped / ntot:5.1f}%\n")
+        if stats is not None:
+            stats.update(n_clipped=int(ntot_clipped), n=int(ntot))
+    if refresh_dT is not None and stats is not None:
+        stats.update(n_material_evaluated=int(n_evaluated), n_material_skipped=int(n_skipped))
+    if verbose and refresh_dT is not None:
+        n = n_evaluated + n_skipped
+        print(f"material re-evaluations skipped: {n_skipped}/{n} = {100 * n_skipped / max(n, 1):5.1f}%", file=sys.stderr)
+    if not store_T:
+        T = reductions
+    if watch is not None:
+        return T, event
+    return T
+
+
+def compute_Txy_probes(t, x, y, xp, yp, T0=300.
+                      , experiment: int = 0
+                      , ufunc=''
+                      , blocked=False
+                      , tile_size=None
+                      , n_threads=None
+                      , verbose=False
+                      ):
+    """Compute the temperature rise at many probe points `(xp,yp)` for the
+    time/pulse location table `(t,x,y)`.
+
+    The per-pulse work (process constants, pulse location, times) is shared
+    by all probes, and every array operation works on all probes at once.
+
+    Args:
+        t, x, y, T0, experiment, blocked, tile_size, n_threads, verbose: see
+            `compute_Txy`.
+        xp, yp: arrays with the coordinates of the probe points.
+        ufunc: '' (numpy array operations), 'ufunc' or 'parallel'.
+            'parallel' runs a multi-threaded numba kernel, parallel over the
+            probes.
+
+    Returns:
+        T: array of shape (n_probes, n_pulses). T[p] is the temperature
+            history at probe point p, as returned by
+            `compute_Txy(t, x, y, T0, xc=xp[p], yc=yp[p])`.
+    """
+    float_type = _get_float_type(t)
+
+    if not isinstance(y, np.ndarray):
+        y = np.full_like(x, y)
+    if not isinstance(T0, np.ndarray):
+        T0 = float_type(T0)
+    xp = np.asarray(xp, dtype=float_type)
+    yp = np.asarray(yp, dtype=float_type)
+
+    if not  x.dtype is t.dtype \
+    or not  y.dtype is t.dtype \
+    or not T0.dtype is t.dtype:
+        raise ValueError(f'Args x, y and T0 must have the same dtype as t ({t.dtype})')
+
+    Ethpi32rho, w2 = _get_kernel_constants(experiment, float_type)
+
+    n_probes = len(xp)
+    n_pulses = len(x)
+    t1 = t[1:]
+    T = np.full((n_probes, n_pulses), T0, dtype=float_type)
+
+    if ufunc == 'parallel':
+        if not has_numba:
+            raise NotImplementedError("ufunc='parallel' requires numba")
+        ca, cc = material.get_material_coefficients(float_type)
+        n_threads_default = get_num_threads()
+        if n_threads:
+            set_num_threads(n_threads)
+        try:
+            # Every thread computes the history of complete probes, in
+            # chunks of the time axis that fit T and t1 in L1.
+            chunksize = get_tile_size(t.dtype.itemsize, 2, level=1)
+            _Txy_probes_parallel(Ethpi32rho, w2, ca, cc, x, y, xp, yp, t1, T, chunksize)
+        finally:
+            set_num_threads(n_threads_default)
+        return T
+
+    pola, polc = material.get_material_polynomials(float_type)
+
+    if tile_size:
+        blocksize = min(tile_size, n_pulses)
+    elif blocked:
+        # The work arrays have a row for every probe.
+        blocksize = min(max(get_tile_size(t.dtype.itemsize, N_TILE_ARRAYS * n_probes, level=2), 64), n_pulses)
+    else:
         blocksize = n_pulses
-        nblocks = 1
+    nblocks = int(np.ceil(n_pulses / blocksize))
+
+    # Allocate work arrays, one row per probe, one column for every time in a tile
+    _a      = np.empty((n_probes, blocksize), dtype=float_type)
+    _c      = np.empty((n_probes, blocksize), dtype=float_type)
+    _a4dt   = np.empty((n_probes, blocksize), dtype=float_type)
+    _a4dtw2 = np.empty((n_probes, blocksize), dtype=float_type)
+    _Tclipd = np.empty((n_probes, blocksize), dtype=float_type)
 
     for iblock in range(nblocks):
         blockstart = iblock * blocksize
         blockstop = min(blockstart + blocksize, n_pulses)
+        Tb  = T [:, blockstart:blockstop]
+        t1b = t1[blockstart:blockstop]
 
-        for i in range(blockstart, blockstop):
+        for i in range(blockstop):
             if verbose and i%1000==0:
                 print(f"{i}/{blockstop}", file=sys.stderr, flush=True)
-            # slice of of times pulse i contributes to
-            slice = np.s_[i:blockstop:]
-
-            # Clip the temperature
-            if report_n_clipped:
-                n_clipped, n = (T[slice] > 1073).sum(), len(T[slice])
-                print(f"pulses>={i}, t={t[i + 1]}: n_clipped = {n_clipped}/{n} = {100 * n_clipped / n:5.1f}%")
-                ntot_clipped += n_clipped
-                ntot += n
-            np.clip(T[slice], 0, 1073, out=_Tclipd[slice])
-
-            # Interpolate the material parameters from the clipped temperatures
+            # times in this tile pulse i contributes to, for all probes
+            tslice = np.s_[max(i - blockstart, 0):blockstop - blockstart]
+            slice = np.s_[:, tslice]
+
+            np.clip(Tb[slice], 0, 1073, out=_Tclipd[slice])
             _a[slice] = pola(_Tclipd[slice])
             _c[slice] = polc(_Tclipd[slice])
 
-            _dt[slice] = t1[slice] - t[i]
-            xi = x[i]
-            yi = y[i] if isinstance(y, np.ndarray) else y
-            #########################################
-            # md2 = - ( (xi-xc)**2 + (yi-yc)**2 )   #
-            # GOTCHA! float32**2 returns a float64. #
-            # That was unexpected!                  #
-            #########################################
-            md2 = - ((xi - xc) * (xi - xc) + (yi - yc) * (yi - yc))
-
-            # Compute temperature rise of pulse i at all subsequent times
+            # column with md2 for all probes
+            md2 = - ((x[i] - xp) * (x[i] - xp) + (y[i] - yp) * (y[i] - yp))[:, None]
+
             if not ufunc:
-                # simple numpy array operations (involving temporary arrays.)
-                _a4dt[slice] = (4 * _a[slice]) * t1[slice]
+                _a4dt[slice] = (4 * _a[slice]) * t1b[tslice]
                 _a4dtw2[slice] = _a4dt[slice] + w2
+                Trise = ((Ethpi32rho / _c[slice])
+                         / (np.sqrt(_a4dt[slice]) * _a4dtw2[slice])
+                         ) * np.exp(md2 / _a4dtw2[slice])
+                Tb[slice] += Trise
+
+            elif ufunc == 'ufunc':
+                Tb[slice] += ufunc_Trise( Ethpi32rho, w2
+                                        , _a[slice], _c[slice]
+                                        , md2
+                                        , t1b[tslice]
+                                        )
+
+            else:
+                raise NotImplementedError(f'ufunc `{ufunc}` not supported')
+
+    return T
+
+def compute_Txy_sweep(t, x, y=0.0, T0=300.
+                     , experiments=0
+                     , xc=0.0, yc=0.0
+                     , ufunc=''
+                     , blocked=False
+                     , tile_size=None
+                     , verbose=False
+                     ):
+    """Compute the temperature history at the probe point `(xc,yc)` for a
+    sweep over process parameters and initial temperatures.
+
+    The pulse geometry and the times are the same for all members of the
+    sweep, they are computed once, and every array operation works on all
+    members at once.
+
+    Args:
+        t, x, y, xc, yc, blocked, tile_size, verbose: see `compute_Txy`.
+        T0: initial temperature, scalar or sequence.
+        experiments: experiment (row of the process table), int or
+            sequence. T0 and experiments are broadcast against each other.
+        ufunc: '' (numpy array operations) or 'ufunc'.
+
+    Returns:
+        T: array of shape (n_sweep, n_pulses). T[b] is the temperature
+            history for member b, as returned by
+            `compute_Txy(t, x, y, T0=T0[b], experiment=experiments[b])`.
+    """
+    float_type = _get_float_type(t)
+
+    if not isinstance(y, np.ndarray):
+        y = float_type(y)
+    if not  x.dtype is t.dtype \
+    or not  y.dtype is t.dtype:
+        raise ValueError(f'Args x and y must have the same dtype as t ({t.dtype})')
+
+    experiments, T0 = np.broadcast_arrays(np.atleast_1d(experiments), np.atleast_1d(np.asarray(T0, dtype=float_type)))
+    n_sweep = len(experiments)
+    n_pulses = len(x)
+
+    # process constants, one row per member
+    constants = [_get_kernel_constants(int(experiment), float_type) for experiment in experiments]
+    Ethpi32rho = np.array([c[0] for c in constants], dtype=float_type)[:, None]
+    w2         = np.array([c[1] for c in constants], dtype=float_type)[:, None]
+
+    xc = float_type(xc)
+    yc = float_type(yc)
+    # shared by all members
+    md2 = - ((x - xc) * (x - xc) + (y - yc) * (y - yc))
+    if not isinstance(md2, np.ndarray):
+        md2 = np.full_like(x, md2)
+    t1 = t[1:]
+
+    pola, polc = material.get_material_polynomials(float_type)
+    T = np.empty((n_sweep, n_pulses), dtype=float_type)
+    T[:] = T0[:, None]
 
+    if tile_size:
+        blocksize = min(tile_size, n_pulses)
+    elif blocked:
+        # The work arrays have a row for every member.
+        blocksize = min(max(get_tile_size(t.dtype.itemsize, N_TILE_ARRAYS * n_sweep, level=2), 64), n_pulses)
+    else:
+        blocksize = n_pulses
+    nblocks = int(np.ceil(n_pulses / blocksize))
+
+    # Allocate work arrays, one row per member, one column for every time in a tile
+    _a      = np.empty((n_sweep, blocksize), dtype=float_type)
+    _c      = np.empty((n_sweep, blocksize), dtype=float_type)
+    _a4dt   = np.empty((n_sweep, blocksize), dtype=float_type)
+    _a4dtw2 = np.empty((n_sweep, blocksize), dtype=float_type)
+    _Tclipd = np.empty((n_sweep, blocksize), dtype=float_type)
+
+    for iblock in range(nblocks):
+        blockstart = iblock * blocksize
+        blockstop = min(blockstart + blocksize, n_pulses)
+        Tb  = T [:, blockstart:blockstop]
+        t1b = t1[blockstart:blockstop]
+
+        for i in range(blockstop):
+            if verbose and i%1000==0:
+                print(f"{i}/{blockstop}", file=sys.stderr, flush=True)
+            # times in this tile pulse i contributes to, for all members
+            tslice = np.s_[max(i - blockstart, 0):blockstop - blockstart]
+            slice = np.s_[:, tslice]
+
+            np.clip(Tb[slice], 0, 1073, out=_Tclipd[slice])
+            _a[slice] = pola(_Tclipd[slice])
+            _c[slice] = polc(_Tclipd[slice])
+
+            if not ufunc:
+                _a4dt[slice] = (4 * _a[slice]) * t1b[tslice]
+                _a4dtw2[slice] = _a4dt[slice] + w2
                 Trise = ((Ethpi32rho / _c[slice])
                          / (np.sqrt(_a4dt[slice]) * _a4dtw2[slice])
-                         ) * np.exp(md2 / _a4dtw2[slice]
-                                    # - (z-z0)**2 / alpha4tx # assuming z=z0
-                                    )
-                T[slice] += Trise
+                         ) * np.exp(md2[i] / _a4dtw2[slice])
+                Tb[slice] += Trise
 
             elif ufunc == 'ufunc':
-                # use numpy universal func by numba
-                Trise = ufunc_Trise( Ethpi32rho, w2
-                                    , _a[slice], _c[slice]
-                                    , md2
-                                    , t1[slice]
-                                    )
-                T[slice] += Trise
-
-            elif ufunc == 'gufunc':
-                gufunc_Trise( Ethpi32rho, w2
-                            , _a[slice], _c[slice]
-                            , md2
-                            , t1[slice]
-                            , T[slice]
-                            )
-
-            elif ufunc == 'afunc':
-                if float_type is np.float64:
-                    afuncDP( Ethpi32rho, w2, _a[slice], _c[slice], md2, t1[slice]
-                            , T[slice]
-                            )
-                elif float_type is np.float32:
-                    afuncSP( Ethpi32rho, w2, _a[slice], _c[slice], md2, t1[slice]
-                            , T[slice]
-                            )
-                else:
-                    raise NotImplementedError(f'Unknown float_type: {float_type}')
+                Tb[slice] += ufunc_Trise( Ethpi32rho, w2
+                                        , _a[slice], _c[slice]
+                                        , md2[i]
+                                        , t1b[tslice]
+                                        )
 
             else:
                 raise NotImplementedError(f'ufunc `{ufunc}` not supported')
 
+    return T
 
-    if report_n_clipped:
-        print(f"ntot_clipped = {ntot_clipped}/{ntot} = {100 * ntot_clipped / ntot:5.1f}%\n")
+def compute_field(t_eval, x, y, grid
+                 , t=None
+                 , T0=300.
+                 , experiment: int = 0
+                 , method='separable'
+                 , oversampling=32
+                 ):
+    """Compute the temperature field on a regular grid at time `t_eval`.
+
+    This is the transpose of `compute_Txy`: many points, all pulses, one
+    time. The kernel is that of `compute_Txy` at time `t_eval`. Its width
+    is the same for all pulses, so it factorises into a Gaussian in x and a
+    Gaussian in y and the sum over the pulses becomes two matrix products,
+
+        T = T0 + P * Ex @ W @ Ey.T
+
+    with `Ex[ix,u] = exp(-(grid_x[ix] - xu[u])**2 / D)` over the distinct
+    pulse x-coordinates xu (similar for y) and W[u,v] the number of pulses
+    at (xu[u],yv[v]).
+
+    The material parameters are interpolated from T0 for all pulses, as
+    there is no temperature history to re-interpolate them from. For the
+    exact history at a few points use `compute_Txy_probes`.
+
+    Args:
+        t_eval: time at which the field is computed.
+        x, y: arrays with the pulse locations.
+        grid: tuple (gx, gy) of 1D arrays with the grid coordinates.
+        t: times of the pulses, as in `compute_Txy`. Only pulses with
+            t[i] < t_eval contribute. If None, all pulses contribute.
+        T0: material temperature at t=0.
+        experiment: process parameters (Eth, omega) are taken from this
+            experiment.
+        method: 'separable' (exact) or 'gridded'. 'separable' is efficient
+            if the pulses lie on a lattice, as for `generate_square`, so
+            that W is small. 'gridded' first distributes the pulses over the
+            nodes of an auxiliary lattice with spacing
+            sqrt(D)/oversampling (bilinear weights), which is approximate
+            (relative error ~ 1/oversampling**2) but efficient for scattered
+            pulses. Pulses whose kernel is below the rounding of the float
+            type on the whole grid are dropped, and the lattice is processed
+            in tiles of `FIELD_TILE` x `FIELD_TILE` nodes that hold pulses,
+            so that the memory is O(n_pulses + FIELD_TILE*(len(gx) +
+            len(gy))), also for large parts. 'separable' falls back to 'gridded' if the pulses are not
+            on a lattice, i.e. if W would have more than
+            `MAX_SEPARABLE_FILL` entries per pulse.
+
+    Returns:
+        T: array of shape (len(gx), len(gy)), T[ix,iy] is the temperature at
+            (gx[ix],gy[iy]).
+    """
+    float_type = _get_float_type(x)
+    gx, gy = (np.asarray(g, dtype=float_type) for g in grid)
+    if not isinstance(y, np.ndarray):
+        y = np.full_like(x, y)
+    if t is not None:
+        fired = t[:len(x)] < t_eval
+        x = x[fired]
+        y = y[fired]
+    if len(x) == 0:
+        # no pulse fired yet
+        return np.full((len(gx), len(gy)), T0, dtype=float_type)
+
+    Ethpi32rho, w2 = _get_kernel_constants(experiment, float_type)
+    pola, polc = material.get_material_polynomials(float_type)
+    Tclipd = float_type(np.clip(T0, 0, 1073))
+    a = pola(Tclipd)
+    c = polc(Tclipd)
+    _a4dt = (4 * a) * float_type(t_eval)
+    D = _a4dt + w2
+    P = (Ethpi32rho / c) / (np.sqrt(_a4dt) * D)
+
+    if method == 'separable':
+        xu, iu = np.unique(x, return_inverse=True)
+        yv, iv = np.unique(y, return_inverse=True)
+        if len(xu) * len(yv) > MAX_SEPARABLE_FILL * len(x):
+            # not a lattice, W would be (nearly) n_pulses x n_pulses
+            method = 'gridded'
+    if method == 'separable':
+        W = np.bincount(iu * len(yv) + iv, minlength=len(xu) * len(yv)).astype(float_type)
+    elif method == 'gridded':
+        return _compute_field_gridded(gx, gy, x, y, D, P, T0, oversampling)
+    else:
+        raise NotImplementedError(f'method `{method}` not supported')
+    W = W.reshape(len(xu), len(yv))
+
+    Ex = np.exp(-np.square(gx[:, None] - xu[None, :]) / D)
+    Ey = np.exp(-np.square(gy[:, None] - yv[None, :]) / D)
+    if len(xu) <= len(yv):
+        T = (Ex @ W) @ Ey.T
+    else:
+        T = Ex @ (W @ Ey.T)
+    T *= P
+    T += T0
     return T
 
+
+def _compute_field_gridded(gx, gy, x, y, D, P, T0, oversampling):
+    """compute_field(method='gridded'), tile by tile of the auxiliary
+    lattice."""
+    float_type = gx.dtype.type
+    T = np.zeros((len(gx), len(gy)), dtype=float_type)
+    # beyond r, exp(-r**2/D) is below the rounding of the float type
+    r = np.sqrt(D * -np.log(np.finfo(float_type).eps))
+    near = ( (x >= gx.min() - r) & (x <= gx.max() + r)
+           & (y >= gy.min() - r) & (y <= gy.max() + r)
+           )
+    x, y = x[near], y[near]
+    if len(x) > 0:
+        h = np.sqrt(D) / oversampling
+        x0, y0 = x.min(), y.min()
+        fx, fy = (x - x0) / h, (y - y0) / h
+        ix, iy = np.floor(fx).astype(np.int64), np.floor(fy).astype(np.int64)
+        fx -= ix
+        fy -= iy
+        # The tile of every pulse. A pulse at local node (i, j) also
+        # deposits on (i+1, j+1), so the tiles overlap by one node.
+        tx, ix = np.divmod(ix, FIELD_TILE)
+        ty, iy = np.divmod(iy, FIELD_TILE)
+        n = FIELD_TILE + 1
+        tiles, inverse = np.unique(tx * (ty.max() + 1) + ty, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        bounds = np.searchsorted(inverse.ravel()[order], np.arange(len(tiles) + 1))
+        for k in range(len(tiles)):
+            b = order[bounds[k]:bounds[k + 1]]
+            fxb, fyb, ixb, iyb = fx[b], fy[b], ix[b], iy[b]
+            W = np.zeros(n * n, dtype=float_type)
+            for dix, diy, w in ( (0, 0, (1 - fxb) * (1 - fyb)), (1, 0, fxb * (1 - fyb))
+                               , (0, 1, (1 - fxb) * fyb),       (1, 1, fxb * fyb)
+                               ):
+                W += np.bincount((ixb + dix) * n + iyb + diy, weights=w, minlength=n * n).astype(float_type)
+            W = W.reshape(n, n)
+            xu = (x0 + h * (tx[b[0]] * FIELD_TILE + np.arange(n))).astype(float_type)
+            yv = (y0 + h * (ty[b[0]] * FIELD_TILE + np.arange(n))).astype(float_type)
+            Ex = np.exp(-np.square(gx[:, None] - xu[None, :]) / D)
+            Ey = np.exp(-np.square(gy[:, None] - yv[None, :]) / D)
+            T += (Ex @ W) @ Ey.T
+    T *= P
+    T += T0
+    return T
+
+
+def _polyval_out(coefficients, x, out):
+    """Evaluate a polynomial (coefficients highest power first) with Horner's
+    rule, without temporaries."""
+    if len(coefficients) == 1:
+        out.fill(coefficients[0])
+        return out
+    np.multiply(x, coefficients[0], out=out)
+    for coefficient in coefficients[1:-1]:
+        np.add(out, coefficient, out=out)
+        np.multiply(out, x, out=out)
+    np.add(out, coefficients[-1], out=out)
+    return out
+
+
+def _Trise_fused(ca4, ccE, w2, md2, t1, T, Tclipd, a4dt, cE, exp=np.exp):
+    """Add the temperature rise of a pulse to T, without temporaries.
+
+    Args:
+        ca4: coefficients of 4 times the diffusivity polynomial.
+        ccE: coefficients of the heat capacity polynomial divided by
+            Ethpi32rho.
+        w2, md2, t1: as in `compute_Txy`
+        T: input/output, temperatures.
+        Tclipd: input, the clipped temperatures, overwritten.
+        a4dt, cE: work arrays.
+        exp: the exponential, called as `exp(x, out=x)`.
+    """
+    _polyval_out(ca4, Tclipd, a4dt)
+    _polyval_out(ccE, Tclipd, cE)
+    np.multiply(a4dt, t1, out=a4dt)
+    denominator = np.sqrt(a4dt, out=Tclipd)
+    a4dtw2 = np.add(a4dt, w2, out=a4dt)
+    np.multiply(denominator, a4dtw2, out=denominator)
+    np.multiply(denominator, cE, out=denominator)
+    Trise = np.divide(md2, a4dtw2, out=a4dtw2)
+    exp(Trise, out=Trise)
+    np.divide(Trise, denominator, out=Trise)
+    np.add(T, Trise, out=T)
+
+
+class HeatAccumulator:
+    """Incremental version of `compute_Txy` for pulses that arrive in
+    batches, e.g. in real time from the scanner.
+
+    Pushing the batches `(t1_b, x_b, y_b)` one after the other gives the same
+    temperatures as `compute_Txy(t, x, y)` with `t = [t0, *t1_0, *t1_1, ...]`
+    and the concatenated pulse locations.
+
+    The accumulator stores one value per pulse (minus its squared distance to
+    the probe). With `tol`, pulses that are farther from the probe than the
+    cutoff radius (`cutoff.get_cutoff_radius`) are not stored, and all
+    pulses are dropped once the prefactor of the kernel is below `tol` for
+    good. With `window`, the temperature at a time only includes the most
+    recent `window` pulses, independent of how the pulses are batched. Large
+    batches are processed in sub-batches of `window` pulses, so memory is
+    bounded by `2*window` stored values and the work per pulse by
+    `2*window` kernel evaluations, for arbitrarily long jobs.
+
+    The contributions of the older pulses are neglected. `window_error` is an
+    upper bound for the resulting error on the temperatures returned by the
+    last `push`: the number of neglected pulses times the largest
+    contribution of a neglected pulse, with the material bounds of
+    `cutoff.get_material_bounds`.
+
+    Args:
+        t0: the time of the first pulse.
+        T0, experiment, xc, yc, tol: see `compute_Txy`.
+        float_type: np.float64 or np.float32.
+        window: None, or the number of most recent pulses that are kept.
+        ufunc: '' (numpy array operations) or 'parallel' (multi-threaded numba
+            kernel, parallel over the times of a batch).
+    """
+    def __init__(self, t0=0., T0=300.
+                , experiment: int = 0
+                , xc=0.0, yc=0.0
+                , float_type=np.float64
+                , tol=None
+                , window=None
+                , ufunc=''
+                ):
+        if ufunc not in ('', 'parallel'):
+            raise NotImplementedError(f'ufunc `{ufunc}` not supported')
+        if ufunc == 'parallel' and not has_numba:
+            raise NotImplementedError("ufunc='parallel' requires numba")
+        self.float_type = float_type
+        self.t_last = float_type(t0)
+        self.T0 = float_type(T0)
+        self.xc = float_type(xc)
+        self.yc = float_type(yc)
+        self.tol = tol
+        self.window = window
+        self.ufunc = ufunc
+        self.Ethpi32rho, self.w2 = _get_kernel_constants(experiment, float_type)
+        self.pola, self.polc = material.get_material_polynomials(float_type)
+        self.ca, self.cc = material.get_material_coefficients(float_type)
+        # minus the squared distance to the probe of the stored pulses, and
+        # their index in the sequence of all pulses
+        self.md2 = np.empty(0, dtype=float_type)
+        self.index = np.empty(0, dtype=np.int64)
+        self.n_pulses = 0
+        # largest md2 of the pulses dropped from the window
+        self.md2_dropped = -np.inf
+        self.window_error = 0.
+        # set on the first push, when the first time is known
+        self.r2_cutoff = None
+
+    def push(self, t1_batch, x_batch, y_batch=0.0):
+        """Add a batch of pulses.
+
+        Args:
+            t1_batch: times at which the temperature after each pulse is
+                computed, i.e. the times of the next pulses (`t[1:]` of
+                `compute_Txy`). Increasing, and larger than the last time of
+                the previous batch.
+            x_batch, y_batch: pulse locations.
+
+        Returns:
+            T: array with the temperatures at the times `t1_batch`.
+        """
+        float_type = self.float_type
+        t1 = np.asarray(t1_batch, dtype=float_type)
+        x = np.asarray(x_batch, dtype=float_type)
+        y = np.broadcast_to(np.asarray(y_batch, dtype=float_type), x.shape)
+        m = len(t1)
+        if len(x) != m:
+            raise ValueError('Args t1_batch and x_batch must have the same length.')
+        if m == 0:
+            return np.empty(0, dtype=float_type)
+        if t1[0] <= self.t_last or np.any(np.diff(t1) <= 0):
+            raise ValueError('Times must be increasing over all batches.')
+        if self.window is not None and m > self.window:
+            T = []
+            window_error = 0.
+            for start in range(0, m, self.window):
+                b = np.s_[start:start + self.window]
+                T.append(self._push(t1[b], x[b], y[b]))
+                window_error = max(window_error, self.window_error)
+            self.window_error = window_error
+            return np.concatenate(T)
+        return self._push(t1, x, y)
+
+    def _push(self, t1, x, y):
+        """`push` for validated arrays."""
+        float_type = self.float_type
+        m = len(t1)
+        md2_new = - ((x - self.xc) * (x - self.xc) + (y - self.yc) * (y - self.yc))
+        n_old = len(self.md2)
+        md2 = np.concatenate((self.md2, md2_new))
+        index = np.concatenate((self.index, self.n_pulses + np.arange(m)))
+
+        # The stored pulses contribute to all times of the batch, the new
+        # pulse k to the times from its own index on.
+        pulses = np.concatenate((np.zeros(n_old, dtype=np.int64), np.arange(m)))
+        if self.tol:
+            jstart, jstop = get_contribution_windows(t1, pulses, md2, self.Ethpi32rho, self.w2, self.tol)
+        else:
+            jstart = pulses
+            jstop = np.full(len(md2), m)
+        if self.window is not None:
+            # pulse i leaves the window at the time of pulse i + window
+            jstop = np.minimum(jstop, np.maximum(index + self.window - self.n_pulses, 0))
+            self._update_window_error(t1, md2[index < self.n_pulses + m - self.window])
+
+        T = np.full(m, self.T0, dtype=float_type)
+        if self.ufunc == 'parallel':
+            chunksize = min(int(np.ceil(m / (8 * get_num_threads()))), get_tile_size(t1.dtype.itemsize, 2, level=1))
+            _Txy_parallel(self.Ethpi32rho, self.w2, self.ca, self.cc, md2, t1, T, jstart, jstop, max(chunksize, 1))
+        else:
+            for k in range(len(md2)):
+                slice = np.s_[jstart[k]:jstop[k]]
+                if slice.start >= slice.stop:
+                    continue
+                Tclipd = np.clip(T[slice], 0, 1073)
+                a4dt = (4 * self.pola(Tclipd)) * t1[slice]
+                a4dtw2 = a4dt + self.w2
+                T[slice] += ((self.Ethpi32rho / self.polc(Tclipd))
+                             / (np.sqrt(a4dt) * a4dtw2)
+                             ) * np.exp(md2[k] / a4dtw2)
+
+        # Update the state
+        if self.tol:
+            if self.r2_cutoff is None:
+                # cutoff radius over all times at which the prefactor exceeds tol
+                a_min, a_max, c_min, c_max = get_material_bounds()
+                self.tau_hi = (float(self.Ethpi32rho) / c_min / self.tol) ** (2 / 3) / (4 * a_min)
+                self.r2_cutoff = get_cutoff_radius(np.array([t1[0], max(self.tau_hi, t1[0])]), self.Ethpi32rho, self.w2, self.tol) ** 2
+            if t1[-1] > self.tau_hi:
+                # no pulse contributes more than tol from now on
+                keep = np.zeros(len(md2), dtype=bool)
+            else:
+                keep = md2 >= - self.r2_cutoff
+            md2, index = md2[keep], index[keep]
+        if self.window is not None:
+            keep = index >= self.n_pulses + m - self.window
+            md2, index = md2[keep], index[keep]
+        self.md2 = md2
+        self.index = index
+        self.n_pulses += m
+        self.t_last = t1[-1]
+        return T
+
+    def _update_window_error(self, t1, md2_dropped):
+        """Bound the error of neglecting the pulses outside the window at the
+        times t1 of a (sub-)batch. md2_dropped: md2 of the stored pulses that
+        leave the window during the batch."""
+        if len(md2_dropped):
+            self.md2_dropped = max(self.md2_dropped, float(md2_dropped.max()))
+        # number of pulses outside the window at every time of the batch
+        n_dropped = np.maximum(self.n_pulses + np.arange(1, len(t1) + 1) - self.window, 0)
+        if not n_dropped[-1]:
+            self.window_error = 0.
+            return
+        a_min, a_max, c_min, c_max = get_material_bounds()
+        t1 = t1.astype(np.float64)
+        w2 = float(self.w2)
+        bound = ( n_dropped * get_prefactor_bound(float(self.Ethpi32rho), w2, t1)
+                * np.exp(self.md2_dropped / (4 * a_max * t1 + w2))
+                )
+        self.window_error = float(bound.max())
+
 if has_numba:
     @vectorize([ float32(float32, float32, float32, float32, float32, float32)
             , float64(float64, float64, float64, float64, float64, float64)
@@ -230,6 +1346,107 @@ if has_numba:
             T[i] += ( (Ethpi32rho / c[i]) / (np.sqrt(_a4dt) * _a4dtw2) ) * np.exp( md2 / _a4dtw2 )
 
 
+    @njit
+    def _horner(coefficients, x):
+        """Evaluate a polynomial, coefficients with the highest power first."""
+        p = coefficients[0]
+        for k in range(1, coefficients.shape[0]):
+            p = p * x + coefficients[k]
+        return p
+
+
+    @njit
+    def _Trise(Ethpi32rho, w2, ca, cc, md2, t1, T):
+        """Temperature rise of a pulse at time t1, with the material parameters
+        interpolated from the (clipped) temperature T.
+
+        Constants are of the float type of the coefficients: integer literals
+        would promote float32 arguments to float64.
+        """
+        float_type = ca.dtype.type
+        Tclipd = min(max(T, float_type(0)), float_type(1073))
+        a = _horner(ca, Tclipd)
+        c = _horner(cc, Tclipd)
+        _a4dt   = (float_type(4)*a)*t1
+        _a4dtw2 = _a4dt + w2
+        return ( (Ethpi32rho / c) / (np.sqrt(_a4dt) * _a4dtw2) ) * np.exp( md2 / _a4dtw2 )
+
+
+    @njit(nogil=True)
+    def _Txy_compiled( Ethpi32rho, w2   # input
+                     , ca, cc           # input, material polynomial coefficients
+                     , md2              # input, array, one value per pulse
+                     , t1               # input
+                     , T                # input/output
+                     , jstart, jstop    # input, pulse k contributes to T[jstart[k]:jstop[k]]
+                     , chunksize
+    ):
+        """Add the temperature rise of all pulses to T, serially.
+
+        T is processed in chunks of chunksize times, all pulses are applied
+        to a chunk before moving on to the next one. jstart and jstop may lie
+        outside [0, len(T)).
+        """
+        n = T.shape[0]
+        for chunkstart in range(0, n, chunksize):
+            chunkstop = min(chunkstart + chunksize, n)
+            for k in range(md2.shape[0]):
+                if jstart[k] >= chunkstop:
+                    continue
+                for j in range(max(jstart[k], chunkstart), min(jstop[k], chunkstop)):
+                    T[j] += _Trise(Ethpi32rho, w2, ca, cc, md2[k], t1[j], T[j])
+
+
+    @njit(parallel=True, nogil=True)
+    def _Txy_parallel( Ethpi32rho, w2   # input
+                     , ca, cc           # input, material polynomial coefficients
+                     , md2              # input, array, one value per pulse
+                     , t1               # input
+                     , T                # input/output
+                     , jstart, jstop    # input, pulse k contributes to T[jstart[k]:jstop[k]]
+                     , chunksize
+    ):
+        """Add the temperature rise of all pulses to T, in parallel over chunks of T.
+
+        The pulses must be ordered in time, jstart[k] must not be smaller
+        than the index of pulse k.
+        """
+        n = T.shape[0]
+        nchunks = (n + chunksize - 1) // chunksize
+        for kc in prange(nchunks):
+            # The work per chunk grows with its position on the time axis.
+            # Interleave early and late chunks, so that every thread gets a
+            # similar amount of work.
+            ichunk = kc // 2 if kc % 2 == 0 else nchunks - 1 - kc // 2
+            chunkstart = ichunk * chunksize
+            chunkstop = min(chunkstart + chunksize, n)
+            for k in range(md2.shape[0]):
+                if jstart[k] >= chunkstop:
+                    continue
+                for j in range(max(jstart[k], chunkstart), min(jstop[k], chunkstop)):
+                    T[j] += _Trise(Ethpi32rho, w2, ca, cc, md2[k], t1[j], T[j])
+
+
+    @njit(parallel=True, nogil=True)
+    def _Txy_probes_parallel( Ethpi32rho, w2   # input
+                            , ca, cc           # input, material polynomial coefficients
+                            , x, y             # input, pulse locations
+                            , xp, yp           # input, probe locations
+                            , t1               # input
+                            , T                # input/output, shape (n_probes, n_pulses)
+                            , chunksize
+    ):
+        """Add the temperature rise of all pulses to T, in parallel over the probes."""
+        n = T.shape[1]
+        for p in prange(T.shape[0]):
+            for chunkstart in range(0, n, chunksize):
+                chunkstop = min(chunkstart + chunksize, n)
+                for i in range(chunkstop):
+                    md2 = - ((x[i] - xp[p]) * (x[i] - xp[p]) + (y[i] - yp[p]) * (y[i] - yp[p]))
+                    for j in range(max(i, chunkstart), chunkstop):
+                        T[p, j] += _Trise(Ethpi32rho, w2, ca, cc, md2, t1[j], T[p, j])
+
+
 if __name__ == '__main__':
     experiment = 0
     t,x,y = generate_square(1,experiment=experiment, dtype=float64)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module autotune
+
+Select the fastest engine of `compute_Txy` for this machine.
+
+The candidates (engine, tiling and, optionally, mixed precision) are timed
+on a square of pulses of the problem size, once per host, float type and
+problem size bucket (powers of 2 of the number of pulses). The cost of a run
+grows quadratically with the number of pulses, so the tuning workload is
+limited to the largest square that can be tuned within `TUNING_BUDGET`
+seconds (estimated once per host and float type). Larger problems share the
+ranking of that workload. Tiling is only a candidate if the workload is
+larger than a tile.
+
+The rankings are saved in a json file per host in `~/.cache/dpvssp` (or
+`$DPVSSP_CACHE_DIR`), so that later runs dispatch without tuning overhead.
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+import dpvssp.heat.engines as engines
+
+# Time to spend on tuning one problem size bucket (s).
+TUNING_BUDGET = 60.
+
+# Number of pulses of the workload that estimates the cost of tuning.
+CALIBRATION_PULSES = 1024
+
+
+def get_cache_dir():
+    """The cache directory of dpvssp, `$DPVSSP_CACHE_DIR` or `~/.cache/dpvssp`."""
+    cache_dir = os.environ.get('DPVSSP_CACHE_DIR')
+    if cache_dir:
+        return Path(cache_dir)
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'dpvssp'
+
+
+def get_cache_file():
+    """The cache file of this host."""
+    return get_cache_dir() / f'autotune-{socket.gethostname()}.json'
+
+
+def get_bucket(n_pulses):
+    """Problem size bucket of `n_pulses`."""
+    return max(int(n_pulses), 1).bit_length()
+
+
+def get_candidates(float_type, n_pulses=None):
+    """The engine configurations that are timed, as keyword arguments of
+    `compute_Txy`. Tiling is left out if a tile would hold all n_pulses
+    times, it would then be the same as no tiling."""
+    from dpvssp.heat import has_numba, N_TILE_ARRAYS
+    from dpvssp.cache_info import get_tile_size
+    tiled = n_pulses is None or n_pulses > get_tile_size(np.dtype(float_type).itemsize, N_TILE_ARRAYS, level=2)
+    blockeds = (False, True) if tiled else (False,)
+    candidates = [ {'ufunc': ufunc, 'blocked': blocked}
+                   for ufunc in ('', 'fused', 'ufunc', 'gufunc', 'afunc')
+                   for blocked in blockeds
+                 ]
+    if has_numba:
+        candidates.append({'ufunc': 'compiled', 'blocked': False})
+        candidates.append({'ufunc': 'parallel', 'blocked': False})
+    if float_type is np.float64:
+        candidates.extend( {'ufunc': ufunc, 'blocked': blocked, 'precision': 'mixed'}
+                           for ufunc in ('', 'fused')
+                           for blocked in blockeds
+                         )
+    return candidates
+
+
+def _get_square(n_pulses, experiment, float_type):
+    """A square of pulses with at most n_pulses pulses (at least 9)."""
+    from dpvssp.heat.geometry import generate_square
+    # (2n+1)**2 <= n_pulses
+    n = max((int(np.sqrt(n_pulses)) - 1) // 2, 1)
+    return generate_square(n, experiment, float_type)
+
+
+def get_max_tuning_pulses(float_type, experiment=0, repetitions=3):
+    """The largest number of pulses for which the candidates can be timed
+    within `TUNING_BUDGET`, extrapolated quadratically from a run of the
+    default engine on `CALIBRATION_PULSES` pulses."""
+    from dpvssp.heat import compute_Txy
+    t,x,y = _get_square(CALIBRATION_PULSES, experiment, float_type)
+    runtime = np.inf
+    for r in range(repetitions):
+        tic = perf_counter()
+        compute_Txy(t, x, y, experiment=experiment)
+        runtime = min(runtime, perf_counter() - tic)
+    # every candidate runs repetitions+1 times
+    n_runs = (repetitions + 1) * len(get_candidates(float_type))
+    return max(int(len(x) * np.sqrt(TUNING_BUDGET / (n_runs * runtime))), 9)
+
+
+def tune(float_type, n_pulses, experiment=0, repetitions=3, verbose=False):
+    """Time the candidates on a square of at most n_pulses pulses.
+
+    Returns:
+        list of candidates (dicts with keyword arguments for `compute_Txy`),
+        fastest first. Every candidate has its runtime (s) under key 's' and
+        the number of pulses of the workload under key 'n_pulses'.
+    """
+    from dpvssp.heat import compute_Txy
+
+    t,x,y = _get_square(n_pulses, experiment, float_type)
+    ranking = []
+    for candidate in get_candidates(float_type, len(x)):
+        try:
+            # the first run compiles
+            compute_Txy(t, x, y, experiment=experiment, **candidate)
+            runtime = np.inf
+            for r in range(repetitions):
+                tic = perf_counter()
+                compute_Txy(t, x, y, experiment=experiment, **candidate)
+                runtime = min(runtime, perf_counter() - tic)
+        except NotImplementedError:
+            continue
+        if verbose:
+            print(f"autotune {float_type.__name__} {len(x)} pulses: {candidate} {runtime:.3g}s", file=sys.stderr)
+        ranking.append(dict(candidate, s=runtime, n_pulses=len(x)))
+    ranking.sort(key=lambda candidate: candidate['s'])
+    return ranking
+
+
+def get_ranking(float_type, n_pulses, experiment=0, verbose=False):
+    """The ranking of the candidates for this host, float type and problem
+    size bucket, from the cache file, or tuned and added to it.
+
+    Problems larger than the largest workload that can be tuned within
+    `TUNING_BUDGET` share the ranking of that workload.
+    """
+    cache_file = get_cache_file()
+    try:
+        cache = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    max_key = f'{float_type.__name__}-max_tuning_pulses'
+    if max_key not in cache:
+        cache[max_key] = get_max_tuning_pulses(float_type, experiment)
+    n_pulses = min(n_pulses, cache[max_key])
+    key = f'{float_type.__name__}-{get_bucket(n_pulses)}'
+    if key not in cache:
+        cache[key] = tune(float_type, n_pulses, experiment, verbose=verbose)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(cache, indent=2))
+            tmp.replace(cache_file)
+        except OSError:
+            pass # tune again next time
+    return cache[key]
+
+
+def select(float_type, n_pulses, experiment=0, options=(), allow_mixed=False, verbose=False):
+    """The fastest candidate that supports the options of the call.
+
+    Args:
+        options: the options of `compute_Txy` in use (see
+            `engines.get_options`). Candidates whose engine does not support
+            them (see `engines.SUPPORT`) are skipped.
+        allow_mixed: whether candidates with precision='mixed' may be
+            selected.
+
+    Returns:
+        dict with keyword arguments for `compute_Txy`.
+    """
+    for candidate in get_ranking(float_type, n_pulses, experiment, verbose):
+        if candidate.get('precision') and not allow_mixed:
+            continue
+        candidate_options = tuple(options) + (('precision',) if candidate.get('precision') else ())
+        if not engines.supports(candidate['ufunc'], candidate_options):
+            continue
+        return {key: value for key, value in candidate.items() if key not in ('s', 'n_pulses')}
+    return {'ufunc': ''}
+
+
+if __name__ == '__main__':
+    for float_type in (np.float64, np.float32):
+        for candidate in get_ranking(float_type, 10**6, verbose=True):
+            print(float_type.__name__, candidate)
+    print('-*# finished #*-')
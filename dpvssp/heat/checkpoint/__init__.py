@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module checkpoint
+
+Checkpoint/restart of the pulse loop of `compute_Txy`.
+
+The state of the loop is the temperature `T` and the position in the loop:
+the time tile `iblock` and the pulse `k` that is to be applied next. A
+checkpoint consists of two files:
+
+* `<path>`, a .npy file with two slots for `T` (shape `(2, n_pulses)`),
+  memory mapped,
+* `<path>.json`, with the valid slot, `iblock`, `k`, the tile size and a key
+  identifying the job.
+
+Checkpoints are written by a background thread. The pulse loop hands over a
+copy of the time tiles of `T` that changed since the slot that is not valid
+was last written, and continues; the thread writes them to that slot,
+flushes, and then replaces the json file (atomically). A job killed at any
+moment thus leaves a consistent checkpoint. The time tiles are processed in
+order, so the tiles before the current one are final and the ones after it
+still hold the initial temperature: a checkpoint copies the tiles the loop
+advanced over since the previous-but-one checkpoint, not all of `T`. If the
+previous checkpoint is still waiting for the thread when the next one is
+due, the next one is skipped rather than stalling the loop.
+"""
+
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+# Default time between checkpoints (s).
+DEFAULT_INTERVAL = 600.
+
+
+def _get_info_path(path):
+    return path.with_name(path.name + '.json')
+
+
+def _read_info(path):
+    try:
+        return json.loads(_get_info_path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def load(path, key):
+    """The state of the checkpoint at `path`.
+
+    Args:
+        key: key of the job, see `dpvssp.heat.memo.get_key`.
+
+    Returns:
+        T, iblock, k, blocksize. None if there is no checkpoint.
+    """
+    path = Path(path)
+    info = _read_info(path)
+    if info is None:
+        return None
+    if info['key'] != key:
+        raise ValueError(f'Checkpoint {path} belongs to another job')
+    T = np.load(path, mmap_mode='r')[info['slot']]
+    return np.array(T), info['iblock'], info['k'], info['blocksize']
+
+
+def remove(path):
+    """Remove the checkpoint at `path`."""
+    path = Path(path)
+    _get_info_path(path).unlink(missing_ok=True)
+    path.unlink(missing_ok=True)
+
+
+class Checkpointer:
+    """Write checkpoints of the pulse loop from a background thread.
+
+    Args:
+        path: the checkpoint file.
+        key: key of the job, see `dpvssp.heat.memo.get_key`.
+        T: the temperatures at the start of the pulse loop. Both slots of a
+            new checkpoint file are initialised with it.
+        blocksize: tile size of the pulse loop.
+        interval: time between checkpoints (s).
+        resume: whether the job resumed from the checkpoint at path (see
+            `load`). Otherwise a new checkpoint file is created.
+    """
+    def __init__(self, path, key, T, blocksize, interval=DEFAULT_INTERVAL, resume=False):
+        self.path = Path(path)
+        self.key = key
+        self.blocksize = blocksize
+        self.interval = interval
+        self.n_written = 0
+        self.n_skipped = 0
+        self._next = perf_counter() + interval
+        self._error = None
+        info = _read_info(self.path) if resume else None
+        # per slot, the time tile that was current when it was last written:
+        # the tiles before it are final in that slot
+        self._iblock = [0, 0]
+        if info is not None and info['key'] == key and info['blocksize'] == blocksize:
+            # resumed job, keep the valid slot until it is replaced. The other
+            # slot holds an older state of the same job.
+            self._slots = np.load(self.path, mmap_mode='r+')
+            self._slot = info['slot']
+            self._iblock[self._slot] = info['iblock']
+        else:
+            remove(self.path)
+            self._slots = np.lib.format.open_memmap(self.path, mode='w+', dtype=T.dtype, shape=(2, len(T)))
+            self._slots[:] = T
+            self._slot = 1
+        # the slot the next checkpoint goes to
+        self._next_slot = 1 - self._slot
+        # at most one checkpoint in flight
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def is_due(self):
+        return perf_counter() >= self._next
+
+    def save(self, T, iblock, k):
+        """Hand over the state to the background thread: a copy of the tiles
+        of T that changed since the slot was last written, up to tile iblock."""
+        self._next = perf_counter() + self.interval
+        if self._queue.full():
+            self.n_skipped += 1
+            return
+        slot = self._next_slot
+        start = self._iblock[slot] * self.blocksize
+        stop = min((iblock + 1) * self.blocksize, len(T))
+        self._queue.put((slot, start, np.array(T[start:stop]), iblock, k))
+        self._iblock[slot] = iblock
+        self._next_slot = 1 - slot
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                if self._error is None:
+                    # after an error, the slots are no longer known to be
+                    # consistent
+                    self._write(*item)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, slot, start, T, iblock, k):
+        # slot is the one that is not referenced by the json file
+        self._slots[slot, start:start + len(T)] = T
+        self._slots.flush()
+        info = { 'key': self.key, 'slot': slot, 'iblock': iblock, 'k': k
+               , 'blocksize': self.blocksize
+               }
+        info_path = _get_info_path(self.path)
+        tmp = info_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(info))
+        tmp.replace(info_path)
+        self._slot = slot
+        self.n_written += 1
+
+    def close(self):
+        """Wait for the pending checkpoint and stop the background thread."""
+        self._queue.put(None)
+        self._thread.join()
+        del self._slots
+        if self._error is not None:
+            raise self._error
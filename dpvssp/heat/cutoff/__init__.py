@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module cutoff
+
+Skip pulse contributions that are below a tolerance.
+
+The temperature rise of a pulse at squared distance `-md2` from the probe,
+
+    Trise = Ethpi32rho / c / (sqrt(4*a*tau) * (4*a*tau + w2)) * exp(md2 / (4*a*tau + w2))
+
+(`tau` is the time argument of the kernel), is bounded by a prefactor that
+decreases with `tau`, evaluated with the smallest `a` and `c`, times an
+exponential that increases with `tau`, evaluated with the largest `a`.
+This gives a time window per pulse outside of which its contribution is
+below `tol`, and a radius outside of which all contributions are below
+`tol`.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+import dpvssp.heat.material as material
+
+
+@lru_cache
+def get_material_bounds():
+    """Smallest and largest diffusivity and heat capacity over the clipping
+    range [0, 1073].
+
+    Returns:
+        a_min, a_max, c_min, c_max
+    """
+    pola, polc = material.get_material_polynomials(np.float64)
+    T = np.linspace(0., 1073., 10731)
+    a = pola(T)
+    c = polc(T)
+    return a.min(), a.max(), c.min(), c.max()
+
+
+def get_prefactor_bound(Ethpi32rho, w2, tau):
+    """Upper bound for the prefactor of the kernel at time `tau`."""
+    a_min, a_max, c_min, c_max = get_material_bounds()
+    a4tau = 4 * a_min * np.asarray(tau, dtype=np.float64)
+    return (Ethpi32rho / c_min) / (np.sqrt(a4tau) * (a4tau + w2))
+
+
+def get_contribution_windows(t1, pulses, md2, Ethpi32rho, w2, tol):
+    """Time windows in which the pulses contribute more than `tol`.
+
+    Args:
+        t1: kernel times at which the temperature is computed (increasing).
+        pulses: int array with the (increasing) indices of the pulses.
+        md2: array, minus the squared distance of every pulse in `pulses`
+            to the probe.
+        Ethpi32rho, w2: process constants, as in `compute_Txy`.
+        tol: contributions below tol are neglected (K).
+
+    Returns:
+        jstart, jstop: int arrays, pulse pulses[k] contributes more than tol
+            only to the times t1[jstart[k]:jstop[k]]. jstart[k] >= pulses[k].
+            If jstart[k] >= jstop[k] the pulse can be skipped altogether.
+    """
+    a_min, a_max, c_min, c_max = get_material_bounds()
+    n = len(pulses)
+    md2 = np.asarray(md2, dtype=np.float64)
+    Ethpi32rho = float(Ethpi32rho)
+    w2 = float(w2)
+
+    # The prefactor is below tol for all times beyond tau_hi, using
+    # sqrt(4*a*tau) * (4*a*tau + w2) >= (4*a*tau)**1.5
+    tau_hi = (Ethpi32rho / c_min / tol) ** (2 / 3) / (4 * a_min)
+    jstop = np.full(n, np.searchsorted(t1, tau_hi, side='right'), dtype=np.int64)
+
+    # Before tau_lo[i] the exponential, times the largest prefactor pulse i
+    # ever has, i.e. at its first time t1[i], is below tol.
+    Pfirst = get_prefactor_bound(Ethpi32rho, w2, t1[pulses])
+    negligible = Pfirst <= tol
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.log(Pfirst / tol)
+        tau_lo = (-md2 / log_ratio - w2) / (4 * a_max)
+    tau_lo[negligible] = np.inf
+    jstart = np.maximum(np.searchsorted(t1, tau_lo, side='left'), pulses)
+    return jstart, jstop
+
+
+def get_cutoff_radius(t1, Ethpi32rho, w2, tol):
+    """Distance beyond which pulses contribute less than `tol` at all times
+    `t1`."""
+    a_min, a_max, c_min, c_max = get_material_bounds()
+    Pmax = float(get_prefactor_bound(float(Ethpi32rho), float(w2), t1[0]))
+    if Pmax <= tol:
+        return 0.
+    return float(np.sqrt((4 * a_max * float(t1[-1]) + float(w2)) * np.log(Pmax / tol)))
+
+
+class PulseIndex:
+    """Uniform grid (cell list) over the pulse locations, to find the pulses
+    near a probe point without visiting all pulses.
+
+    Args:
+        x, y: arrays with the pulse locations.
+        cell_size: edge of the grid cells. Queries are most efficient when
+            it is of the order of the query radius.
+    """
+    def __init__(self, x, y, cell_size):
+        self.cell_size = float(cell_size)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.broadcast_to(np.asarray(y, dtype=np.float64), x.shape)
+        self.x0 = x.min() if len(x) else 0.
+        self.y0 = y.min() if len(y) else 0.
+        ix = ((x - self.x0) // self.cell_size).astype(np.int64)
+        iy = ((y - self.y0) // self.cell_size).astype(np.int64)
+        self.nx = int(ix.max()) + 1 if len(x) else 0
+        self.ny = int(iy.max()) + 1 if len(y) else 0
+        cell = ix * self.ny + iy
+        # pulse indices sorted by cell, in pulse order within a cell
+        self.order = np.argsort(cell, kind='stable')
+        self.cell_start = np.searchsorted(cell[self.order], np.arange(self.nx * self.ny + 1))
+        self.x = x
+        self.y = y
+
+    def query(self, xc, yc, r):
+        """Indices of the pulses within distance `r` from `(xc,yc)`, in
+        increasing order."""
+        h = self.cell_size
+        ix0 = max(int((xc - r - self.x0) // h), 0)
+        ix1 = min(int((xc + r - self.x0) // h), self.nx - 1)
+        iy0 = max(int((yc - r - self.y0) // h), 0)
+        iy1 = min(int((yc + r - self.y0) // h), self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.empty(0, dtype=np.int64)
+        # the cells of a column ix, iy0..iy1, are contiguous in self.order
+        chunks = [ self.order[self.cell_start[ix * self.ny + iy0]:self.cell_start[ix * self.ny + iy1 + 1]]
+                   for ix in range(ix0, ix1 + 1)
+                 ]
+        candidates = np.concatenate(chunks)
+        dx = self.x[candidates] - xc
+        dy = self.y[candidates] - yc
+        return np.sort(candidates[dx * dx + dy * dy <= r * r])
+
+
+if __name__ == '__main__':
+    print(get_material_bounds())
+    print('-*# finished #*-')
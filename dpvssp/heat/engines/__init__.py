@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module engines
+
+The engines of `compute_Txy` (its `ufunc` argument) and the options they
+support. `compute_Txy` validates its arguments against this table, and
+`ufunc='auto'` (`autotune.select`) only selects engines that support the
+options in use. A new option or engine is added here, not as a check in
+`compute_Txy`.
+"""
+
+ENGINES = ('', 'ufunc', 'gufunc', 'afunc', 'fused', 'compiled', 'parallel', 'farfield')
+
+# engines with the tiled pulse loop of compute_Txy
+_TILED = ('', 'ufunc', 'gufunc', 'afunc', 'fused', 'compiled')
+
+# option of compute_Txy -> engines that support it. 'precision' stands for
+# precision='mixed'. Options that are not listed are supported by all engines.
+SUPPORT = { 'report_n_clipped': ('', 'ufunc', 'gufunc', 'afunc', 'fused')
+          , 'material_tol'    : ('', 'ufunc', 'gufunc', 'afunc', 'farfield')
+          , 'refresh_dT'      : ('', 'ufunc', 'gufunc', 'afunc')
+          , 'exp_tol'         : ('', 'fused')
+          , 'precision'       : ('', 'fused')
+          , 'at'              : _TILED + ('parallel',)
+          , 'chunk_size'      : _TILED
+          , 'checkpoint_file' : _TILED
+          , 'watch'           : _TILED
+          , 'reductions'      : _TILED
+          }
+
+# pairs of options that cannot be combined, whatever the engine
+CONFLICTS = ( ('chunk_size', 'precision')
+            , ('chunk_size', 'checkpoint_file')
+            )
+
+
+def get_options( report_n_clipped=False, material_tol=None, refresh_dT=None, exp_tol=None
+               , precision=None, at=None, chunk_size=None, checkpoint_file=None
+               , watch=None, reductions=None
+               ):
+    """The options of `SUPPORT` that are in use, for these keyword arguments
+    of `compute_Txy`."""
+    in_use = { 'report_n_clipped': bool(report_n_clipped)
+             , 'material_tol'    : bool(material_tol)
+             , 'refresh_dT'      : refresh_dT is not None
+             , 'exp_tol'         : exp_tol is not None
+             , 'precision'       : precision == 'mixed'
+             , 'at'              : at is not None
+             , 'chunk_size'      : bool(chunk_size)
+             , 'checkpoint_file' : checkpoint_file is not None
+             , 'watch'           : watch is not None
+             , 'reductions'      : reductions is not None
+             }
+    return tuple(option for option, used in in_use.items() if used)
+
+
+def _get_conflicts(options):
+    """The pairs of CONFLICTS that are both in `options`."""
+    return [(a, b) for a, b in CONFLICTS if a in options and b in options]
+
+
+def supports(ufunc, options):
+    """Whether engine `ufunc` supports all `options` together."""
+    return ufunc in ENGINES \
+       and all(ufunc in SUPPORT.get(option, ENGINES) for option in options) \
+       and not _get_conflicts(options)
+
+
+def check(ufunc, options):
+    """Raise NotImplementedError if engine `ufunc` does not support all
+    `options` together."""
+    if ufunc not in ENGINES:
+        raise NotImplementedError(f'ufunc `{ufunc}` not supported')
+    for a, b in _get_conflicts(options):
+        raise NotImplementedError(f"{_describe(a)} cannot be combined with {_describe(b)}")
+    for option in options:
+        if ufunc not in SUPPORT.get(option, ENGINES):
+            raise NotImplementedError(f"{_describe(option)} is not supported for ufunc='{ufunc}'")
+
+
+def _describe(option):
+    """The option as it is passed to compute_Txy."""
+    return "precision='mixed'" if option == 'precision' else option
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module farfield
+
+Approximate engine for long pulse trains, in the style of a 1D fast multipole
+method.
+
+The kernel evaluated by `compute_Txy` for pulse i at time t1[j] is
+
+    Trise[i,j] = P[j] * exp(md2[i] * s[j])
+
+with `P[j] = Ethpi32rho / c / (sqrt(4*a*t1[j]) * (4*a*t1[j] + w2))` and
+`s[j] = 1 / (4*a*t1[j] + w2)`, where `a` and `c` are interpolated from T[j].
+The pulse only enters through md2. The pulses are grouped in a binary tree
+over the pulse index. For a group G with md2 in [dlo, dhi], exp(d*s) is
+interpolated at p Chebyshev points d_k of that interval:
+
+    sum_{i in G} exp(md2[i]*s) ~ sum_k W_k exp(d_k*s),   W_k = sum_{i in G} L_k(md2[i])
+
+The weights W_k are computed once per group, after which the group costs p
+exponentials per time, instead of len(G). The interpolation error is small
+when the group's md2 interval is narrow compared to 1/s, which is the case
+at late times, where the kernel varies slowly.
+
+The time axis is processed in tiles of a few leaves (`TILE_LEAVES`). For a
+tile, the pulses before it are
+covered by O(log n) groups, oldest first. Groups that are not admissible
+for the tolerance are split, down to leaves that are evaluated exactly. The
+pulses inside the tile are evaluated exactly, as in `compute_Txy`. Material
+parameters are re-interpolated once per group, with a midpoint
+(predictor-corrector) step; a group is also split if the error estimate of
+that step exceeds its share of the tolerance.
+
+Every group gets a share of the tolerance proportional to its number of
+pulses, so that the error of every T[j] stays below `tol`. The bound for
+the interpolation error is rigorous, the estimate for the material error
+is not.
+"""
+
+from math import factorial
+
+import numpy as np
+
+from dpvssp.heat.cutoff import get_material_bounds, get_prefactor_bound
+
+# Default number of times per tile, in leaves. The pulses inside a tile are
+# evaluated exactly, so the tile must be small compared to the pulse train
+# for the far field to pay off.
+TILE_LEAVES = 4
+
+
+def _chebyshev_basis(u, p):
+    """Lagrange basis polynomials of the p Chebyshev points (first kind) on
+    [-1,1], evaluated at u (barycentric formula).
+
+    Returns:
+        array of shape (len(u), p)
+    """
+    theta = (2 * np.arange(p) + 1) * np.pi / (2 * p)
+    nodes = np.cos(theta)
+    weights = (-1.) ** np.arange(p) * np.sin(theta)
+    diff = u[:, None] - nodes[None, :]
+    exact = diff == 0
+    diff[exact] = 1.
+    basis = weights / diff
+    basis /= basis.sum(axis=1, keepdims=True)
+    rows = exact.any(axis=1)
+    basis[rows] = exact[rows]
+    return basis
+
+
+class ChebyshevTree:
+    """Binary tree over a sequence of pulses with Chebyshev weights per node.
+
+    Level 0 nodes (leaves) hold `leaf_size` consecutive pulses, level l nodes
+    `leaf_size * 2**l`.
+
+    Args:
+        md2: minus the squared distances of the pulses to the probe, in
+            pulse order.
+        order: number of Chebyshev points per node.
+        leaf_size: number of pulses per leaf.
+    """
+    def __init__(self, md2, order=8, leaf_size=64):
+        self.order = order
+        self.leaf_size = leaf_size
+        self.n = len(md2)
+        md2 = np.asarray(md2, dtype=np.float64)
+        nodes = np.cos((2 * np.arange(order) + 1) * np.pi / (2 * order))
+        self.dnodes = []    # per level, array (n_nodes, order) with the Chebyshev points
+        self.W = []         # per level, array (n_nodes, order) with the weights
+        self.halfwidth = [] # per level, array (n_nodes,) with the half width of the md2 interval
+        self.dhi = []       # per level, array (n_nodes,) with the largest md2
+        size = leaf_size
+        while True:
+            bounds = np.arange(0, self.n, size)
+            dlo = np.minimum.reduceat(md2, bounds) if self.n else np.empty(0)
+            dhi = np.maximum.reduceat(md2, bounds) if self.n else np.empty(0)
+            mid = 0.5 * (dhi + dlo)
+            h = 0.5 * (dhi - dlo)
+            inode = np.arange(self.n) // size
+            u = (md2 - mid[inode]) / np.where(h > 0, h, 1.)[inode]
+            basis = _chebyshev_basis(u, order)
+            self.W.append(np.add.reduceat(basis, bounds, axis=0) if self.n else np.empty((0, order)))
+            self.dnodes.append(mid[:, None] + h[:, None] * nodes[None, :])
+            self.halfwidth.append(h)
+            self.dhi.append(dhi)
+            if size >= self.n:
+                break
+            size *= 2
+
+    @property
+    def nlevels(self):
+        return len(self.W)
+
+    def span(self, level, k):
+        """Range of pulses of node k at level `level`."""
+        size = self.leaf_size << level
+        return k * size, min((k + 1) * size, self.n)
+
+    def prefix_nodes(self, stop):
+        """Nodes covering the pulses [0, stop), in order, and the first pulse
+        not covered by them (at most leaf_size - 1 pulses are left)."""
+        nodes = []
+        pos = 0
+        for level in range(self.nlevels - 1, -1, -1):
+            size = self.leaf_size << level
+            while pos + size <= stop:
+                nodes.append((level, pos // size))
+                pos += size
+        return nodes, pos
+
+    def evaluate(self, level, k, s):
+        """sum_{i in node} exp(md2[i]*s), for an array s."""
+        return np.exp(np.multiply.outer(s, self.dnodes[level][k])) @ self.W[level][k]
+
+
+def compute_farfield( Ethpi32rho, w2, pola, polc
+                    , pulses, md2
+                    , t1, T
+                    , tol
+                    , tile_size=None
+                    , order=8
+                    , leaf_size=64
+                    , verbose=False
+                    ):
+    """Add the temperature rise of the pulses to T, approximating groups of
+    older pulses by their Chebyshev expansion.
+
+    Args:
+        Ethpi32rho, w2: process constants, as in `compute_Txy`.
+        pola, polc: material polynomials.
+        pulses: int array with the (increasing) indices of the pulses.
+        md2: minus the squared distance of the pulses to the probe.
+        t1: kernel times.
+        T: initial temperature on input, temperature on output.
+        tol: tolerance (K) for the error of the temperatures.
+        tile_size: number of times per tile, default `TILE_LEAVES` leaves.
+        order: number of Chebyshev points per group.
+        leaf_size: number of pulses in the smallest groups, which are
+            evaluated exactly.
+
+    Returns:
+        number of (group, tile) pairs that were approximated and number of
+        (pulse, tile) pairs that were evaluated exactly.
+    """
+    float_type = T.dtype.type
+    n_pulses = len(T)
+    if not tile_size:
+        tile_size = TILE_LEAVES * leaf_size
+    tree = ChebyshevTree(md2, order=order, leaf_size=leaf_size)
+    a_min, a_max, c_min, c_max = get_material_bounds()
+    # share of the tolerance per pulse
+    budget = tol / max(len(pulses), 1)
+    # interpolation error of exp(d*s) on an interval of half width h is
+    # bounded by (h*s)**order * err_factor
+    err_factor = 1. / (2 ** (order - 1) * factorial(order))
+    n_approximated = 0
+    n_exact = 0
+
+    def material(Tb):
+        Tclipd = np.clip(Tb, 0, 1073)
+        a = pola(Tclipd)
+        c = polc(Tclipd)
+        return a, c
+
+    def kernel_factors(Tb, t1b):
+        a, c = material(Tb)
+        _a4dt = (4 * a) * t1b
+        _a4dtw2 = _a4dt + w2
+        P = (Ethpi32rho / c) / (np.sqrt(_a4dt) * _a4dtw2)
+        return P, 1 / _a4dtw2
+
+    def apply_exact(Tb, t1b, k, sl):
+        a, c = material(Tb[sl])
+        _a4dt = (4 * a) * t1b[sl]
+        _a4dtw2 = _a4dt + w2
+        Tb[sl] += ((Ethpi32rho / c) / (np.sqrt(_a4dt) * _a4dtw2)) * np.exp(md2[k] / _a4dtw2)
+
+    for blockstart in range(0, n_pulses, tile_size):
+        blockstop = min(blockstart + tile_size, n_pulses)
+        Tb  = T [blockstart:blockstop]
+        t1b = t1[blockstart:blockstop]
+        # bounds of P and s over the tile
+        Pmax = float(get_prefactor_bound(float(Ethpi32rho), float(w2), t1b[0]))
+        smin = 1. / (4 * a_max * float(t1b[-1]) + float(w2))
+        smax = 1. / (4 * a_min * float(t1b[0]) + float(w2))
+
+        # far field: pulses before the tile
+        stack = []
+        nodes, kfar = tree.prefix_nodes(np.searchsorted(pulses, blockstart))
+        stack.extend(reversed(nodes))
+        while stack:
+            level, knode = stack.pop()
+            kstart, kstop = tree.span(level, knode)
+            if level > 0:
+                node_budget = budget * (kstop - kstart)
+                h = tree.halfwidth[level][knode]
+                dhi = tree.dhi[level][knode]
+                # The interpolation error is bounded by
+                # (h*s)**order * exp(dhi*s) * err_factor for every pulse,
+                # which is maximal for s = order/-dhi.
+                s_ = min(max(order / -dhi, smin), smax) if dhi < 0 else smax
+                err = Pmax * (h * s_) ** order * np.exp(dhi * s_) * err_factor * (kstop - kstart)
+                if err <= 0.5 * node_budget:
+                    # predictor: material at the current temperature,
+                    # corrector: material at the midpoint of the rise.
+                    P, s = kernel_factors(Tb, t1b)
+                    rise = P * tree.evaluate(level, knode, s)
+                    P, s = kernel_factors(Tb + 0.5 * rise, t1b)
+                    rise_corrected = P * tree.evaluate(level, knode, s)
+                    # The difference between predictor and corrector is
+                    # first order in the relative change of the material
+                    # parameters, the error of the corrector second order:
+                    # about correction**2 / rise (K).
+                    correction = np.abs(rise_corrected - rise)
+                    err_material = correction * correction / np.maximum(np.abs(rise_corrected), np.finfo(np.float64).tiny)
+                    if err_material.max() <= 0.5 * node_budget:
+                        Tb += rise_corrected.astype(float_type)
+                        n_approximated += 1
+                        continue
+                stack.append((level - 1, 2 * knode + 1))
+                stack.append((level - 1, 2 * knode))
+            else:
+                for k in range(kstart, kstop):
+                    apply_exact(Tb, t1b, k, np.s_[:])
+                n_exact += kstop - kstart
+        # remaining pulses before the tile
+        for k in range(kfar, np.searchsorted(pulses, blockstart)):
+            apply_exact(Tb, t1b, k, np.s_[:])
+            n_exact += 1
+
+        # near field: pulses inside the tile
+        for k in range(np.searchsorted(pulses, blockstart), np.searchsorted(pulses, blockstop)):
+            apply_exact(Tb, t1b, k, np.s_[pulses[k] - blockstart:])
+            n_exact += 1
+
+        if verbose:
+            print(f"{blockstop}/{n_pulses}: {n_approximated=}, {n_exact=}")
+
+    return n_approximated, n_exact
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module fastexp
+
+Vectorised exponential for non-positive arguments, with selectable accuracy.
+
+The exponent of the kernel, `md2 / (4*a*t1 + w2)`, is never positive, so
+only `x <= 0` is supported. The argument is reduced as
+
+    x = k*ln2 + r,   k = round(x/ln2),   |r| <= ln2/2
+
+(with ln2 split in a high and a low part, so that `k*ln2_hi` is exact), and
+
+    exp(x) = 2**k * p(r)
+
+where `p` is a polynomial fit of exp on [-ln2/2, ln2/2]. The degree of `p`
+is the smallest one for which the relative error of the fit is below the
+requested tolerance. `2**k` is assembled directly in the exponent bits of
+the result. Results below the smallest normal number are flushed to zero.
+"""
+
+from functools import lru_cache
+from math import factorial
+
+import numpy as np
+try:
+    from numba import njit
+    has_numba = True
+except:
+    has_numba = False
+
+LN2_HI = 0.693145751953125          # 12 significant bits, k*LN2_HI is exact
+LN2_LO = 1.42860682030941723212e-06 # ln(2) - LN2_HI
+LOG2E = 1.4426950408889634
+
+# exponent bias of the float types
+_BIAS = {np.float64: 1023, np.float32: 127}
+
+MAX_DEGREE = 13
+
+
+def get_xmin(float_type):
+    """Smallest argument for which the result is a normal number."""
+    return (1 - _BIAS[float_type]) * np.log(2.) + 0.5
+
+
+def _relative_error(coefficients):
+    """Relative error of the polynomial against exp on [-ln2/2, ln2/2]."""
+    r = np.linspace(-0.5 * np.log(2.), 0.5 * np.log(2.), 10001)
+    return np.abs(np.polyval(coefficients, r) / np.exp(r) - 1).max()
+
+
+def _fit(degree):
+    """Coefficients (highest power first) of a polynomial approximation of exp
+    on [-ln2/2, ln2/2], and its relative error.
+
+    A least squares fit in the Chebyshev nodes is close to the minimax
+    polynomial, but its coefficients carry the rounding errors of the fit.
+    The Taylor polynomial is more accurate when the truncation error is
+    below that level. The better of both is returned.
+    """
+    h = 0.5 * np.log(2.)
+    nodes = h * np.cos(np.pi * (np.arange(4 * (degree + 1)) + 0.5) / (4 * (degree + 1)))
+    weights = np.exp(-nodes) # relative error
+    V = np.vander(nodes, degree + 1) * weights[:, np.newaxis]
+    fit = np.linalg.lstsq(V, np.exp(nodes) * weights, rcond=None)[0]
+    taylor = 1. / np.array([factorial(i) for i in range(degree, -1, -1)], dtype=np.float64)
+    return min(((c, _relative_error(c)) for c in (fit, taylor)), key=lambda ce: ce[1])
+
+
+@lru_cache
+def get_exp_coefficients(float_type=np.float64, tol=0.):
+    """Polynomial for `exp(r)`, `|r| <= ln2/2`, with a relative error below
+    `tol`, or as accurate as the float type allows for `tol=0`.
+
+    Returns:
+        coefficients: array of dtype `float_type`, highest power first.
+    """
+    # the relative error is measured in float64
+    tol = max(tol, 0.5 * np.finfo(float_type).eps, 2 * np.finfo(np.float64).eps)
+    for degree in range(1, MAX_DEGREE + 1):
+        coefficients, err = _fit(degree)
+        if err <= tol:
+            break
+    return coefficients.astype(float_type)
+
+
+@lru_cache
+def _as_tuple(float_type, tol):
+    return tuple(get_exp_coefficients(float_type, tol))
+
+
+def exp(x, tol=0., out=None):
+    """Exponential of the non-positive array `x`.
+
+    Args:
+        x: array of float64 or float32, `x <= 0`.
+        tol: relative tolerance of the polynomial (see
+            `get_exp_coefficients`). 0 gives (close to) full accuracy.
+        out: optional output array, may be `x` itself.
+
+    Returns:
+        array with exp(x), dtype of `x`.
+    """
+    float_type = x.dtype.type
+    coefficients = get_exp_coefficients(float_type, tol)
+    xmin = float_type(get_xmin(float_type))
+    if has_numba:
+        if out is x:
+            kernel = _exp64_inplace if float_type is np.float64 else _exp32_inplace
+            kernel(x, _as_tuple(float_type, tol), xmin)
+        else:
+            if out is None:
+                out = np.empty_like(x)
+            kernel = _exp64 if float_type is np.float64 else _exp32
+            kernel(x, _as_tuple(float_type, tol), xmin, out)
+        return out
+
+    if out is None:
+        out = np.empty_like(x)
+
+    # numpy fallback
+    underflow = x < xmin
+    xc = np.maximum(x, xmin)
+    k = np.rint(xc * float_type(LOG2E))
+    r = xc - k * float_type(LN2_HI) - k * float_type(LN2_LO)
+    p = np.polyval(coefficients, r)
+    np.ldexp(p, k.astype(np.int32), out=out)
+    out[underflow] = 0
+    return out
+
+
+if has_numba:
+    # The coefficients are passed as a tuple: its length is known at compile
+    # time, so that Horner's rule is unrolled and the loop over x vectorised.
+    # k is rounded by adding `shifter` (1.5 * 2**mantissa), after which the
+    # integer k sits in the low bits of the sum. These bits are moved to the
+    # exponent bits to form 2**k.
+
+    @njit(inline='always', fastmath={'nnan', 'ninf', 'nsz'})
+    def _exp64_scalar(x, coefficients, xmin):
+        """exp(x) = 2**k * p(r), float64."""
+        shifter = 6755399441055744.0
+        bias_bits = np.int64(1023) - np.float64(shifter).view(np.int64)
+        xc = max(x, xmin)
+        kshifted = xc * LOG2E + shifter
+        k = kshifted - shifter
+        r = (xc - k * LN2_HI) - k * LN2_LO
+        p = coefficients[0]
+        for c in coefficients[1:]:
+            p = p * r + c
+        scale = np.int64((np.float64(kshifted).view(np.int64) + bias_bits) << 52).view(np.float64)
+        return p * scale if x >= xmin else 0.
+
+
+    @njit(inline='always', fastmath={'nnan', 'ninf', 'nsz'})
+    def _exp32_scalar(x, coefficients, xmin):
+        """exp(x) = 2**k * p(r), float32."""
+        shifter = np.float32(12582912.0)
+        bias_bits = np.int32(127) - np.float32(shifter).view(np.int32)
+        xc = max(x, xmin)
+        kshifted = xc * np.float32(LOG2E) + shifter
+        k = kshifted - shifter
+        r = (xc - k * np.float32(LN2_HI)) - k * np.float32(LN2_LO)
+        p = coefficients[0]
+        for c in coefficients[1:]:
+            p = p * r + c
+        scale = np.int32((np.float32(kshifted).view(np.int32) + bias_bits) << np.int32(23)).view(np.float32)
+        return p * scale if x >= xmin else np.float32(0)
+
+
+    # Separate kernels for in place evaluation: if x and out are the same
+    # array, the aliasing check of the vectorised loop fails and the loop
+    # runs scalar.
+
+    @njit(nogil=True)
+    def _exp64(x, coefficients, xmin, out):
+        for j in range(x.shape[0]):
+            out[j] = _exp64_scalar(x[j], coefficients, xmin)
+
+
+    @njit(nogil=True)
+    def _exp64_inplace(x, coefficients, xmin):
+        for j in range(x.shape[0]):
+            x[j] = _exp64_scalar(x[j], coefficients, xmin)
+
+
+    @njit(nogil=True)
+    def _exp32(x, coefficients, xmin, out):
+        for j in range(x.shape[0]):
+            out[j] = _exp32_scalar(x[j], coefficients, xmin)
+
+
+    @njit(nogil=True)
+    def _exp32_inplace(x, coefficients, xmin):
+        for j in range(x.shape[0]):
+            x[j] = _exp32_scalar(x[j], coefficients, xmin)
+
+
+def error_report(float_type=np.float64, tol=0., n=1000001):
+    """Largest relative error and error in ulp of `exp(x, tol)` against
+    `np.exp(x)`, over n points in [xmin, 0].
+
+    Returns:
+        degree, max_relative_error, max_ulp_error
+    """
+    x = np.linspace(get_xmin(float_type), 0., n).astype(float_type)
+    exact = np.exp(x.astype(np.float64))
+    result = exp(x, tol).astype(np.float64)
+    relative = np.abs(result / exact - 1)
+    ulp = np.abs(result - exact) / np.spacing(exact.astype(float_type)).astype(np.float64)
+    degree = len(get_exp_coefficients(float_type, tol)) - 1
+    return degree, relative.max(), ulp.max()
+
+
+if __name__ == '__main__':
+    for float_type in (np.float64, np.float32):
+        for tol in (0., 1e-7, 1e-4):
+            degree, relative, ulp = error_report(float_type, tol)
+            print(f"{float_type.__name__:8} {tol=:6.0e} {degree=:2} max relative error = {relative:.2e} = {ulp:.3g} ulp")
+    print('-*# finished #*-')
@@ -14,9 +14,15 @@ sys.path.insert(0, str(get_workspace_dir(__file__) / 'exponential_decay'))
 
 from exponential_decay import generate_square_txy as _generate_square_txy
 import dpvssp.heat.process as process
+import dpvssp.heat.pulsetable as pulsetable
+import dpvssp.heat.reltime as reltime
 
-def generate_square(n, experiment, float_type=np.float64):
-    """Generate (2n+1)x(2n+1) square of pulses"""
+def generate_square(n, experiment, float_type=np.float64, relative=False):
+    """Generate (2n+1)x(2n+1) square of pulses
+
+    If `relative`, t is a `reltime.RelativeTimes`, encoded from the float64
+    times, with deltas of float_type.
+    """
 
     deltat = 1./process.get_laser_frequency(experiment)
     deltax = process.get_mark_speed(experiment)*deltat
@@ -26,15 +32,247 @@ def generate_square(n, experiment, float_type=np.float64):
     if float_type is np.float64:
         pass
     elif float_type is np.float32:
-        t = t.astype(float_type)
         x = x.astype(float_type)
         y = y.astype(float_type)
+        if not relative:
+            t = t.astype(float_type)
     else:
         raise NotImplementedError(f"Unsupported float type {float_type}")
 
+    if relative:
+        t = reltime.RelativeTimes.from_absolute(t, float_type=float_type)
+
     return t,x,y
 
 
+# ------------------------------------------------------------------------------
+# Toolpaths: scan strategies, emitted in chunks
+# ------------------------------------------------------------------------------
+
+# Default number of pulses per chunk of `Toolpath.chunks`.
+CHUNK_SIZE = 1 << 16
+
+
+class Toolpath:
+    """A sequence of scan vectors, with equidistant pulses along every vector.
+
+    The laser fires at a constant frequency, also while jumping from one
+    vector to the next, so pulse i fires at time i*deltat. A vector that
+    ends where the next one starts leaves that point to the next vector.
+
+    Attributes:
+        vectors: array of shape (n_vectors, 4), the start and end points
+            (x0, y0, x1, y1) of the scan vectors, in scan order.
+        deltat: time between pulses.
+        deltax: distance between pulses along a vector.
+        float_type: float type of the emitted tables.
+        counts: int array, number of pulses of every vector.
+        n_pulses: total number of pulses.
+    """
+    def __init__(self, vectors, deltat, deltax, float_type=np.float64):
+        if float_type not in (np.float64, np.float32):
+            raise NotImplementedError(f"Unsupported float type {float_type}")
+        self.vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 4)
+        self.deltat = deltat
+        self.deltax = deltax
+        self.float_type = float_type
+        x0, y0, x1, y1 = self.vectors.T
+        length = np.hypot(x1 - x0, y1 - y0)
+        # one pulse at the start of every vector, then every deltax (the
+        # tolerance avoids losing the last pulse to rounding)
+        self.counts = np.floor(length / deltax * (1 + 1e-12)).astype(np.int64) + 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(length > 0, deltax / length, 0.)
+        # pulse increments along every vector
+        self._dx = (x1 - x0) * step
+        self._dy = (y1 - y0) * step
+        # A vector that ends where the next one starts (e.g. at the corners
+        # of a contour) would fire twice at the same spot: drop its last
+        # pulse.
+        xlast = x0 + (self.counts - 1) * self._dx
+        ylast = y0 + (self.counts - 1) * self._dy
+        joined = np.hypot(xlast[:-1] - x0[1:], ylast[:-1] - y0[1:]) < 1e-6 * deltax
+        self.counts[:-1] -= joined
+        self._offsets = np.concatenate(([0], np.cumsum(self.counts)))
+        self.n_pulses = int(self._offsets[-1])
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """Iterate over the pulse table in chunks of chunk_size pulses.
+
+        Yields:
+            t, x, y: arrays of float_type, as the slices `t[start:stop+1]`,
+                `x[start:stop]`, `y[start:stop]` of the full table, i.e.
+                `len(t) == len(x) + 1`.
+        """
+        ft = self.float_type
+        x0, y0 = self.vectors[:, 0], self.vectors[:, 1]
+        for start in range(0, self.n_pulses, chunk_size):
+            stop = min(start + chunk_size, self.n_pulses)
+            i = np.arange(start, stop)
+            # vector of every pulse, and the index of the pulse on it
+            v = np.searchsorted(self._offsets, i, side='right') - 1
+            k = i - self._offsets[v]
+            x = (x0[v] + k * self._dx[v]).astype(ft)
+            y = (y0[v] + k * self._dy[v]).astype(ft)
+            t = (np.arange(start, stop + 1) * self.deltat).astype(ft)
+            yield t, x, y
+
+    def get_txy(self):
+        """The full pulse table (t,x,y)."""
+        t, x, y = zip(*self.chunks())
+        return np.concatenate([tc[:-1] for tc in t] + [t[-1][-1:]]), np.concatenate(x), np.concatenate(y)
+
+    def write(self, path, chunk_size=CHUNK_SIZE):
+        """Write the pulse table to a pulse table file (see
+        `dpvssp.heat.pulsetable`), chunk by chunk."""
+        tm, xm, ym = pulsetable.create_pulse_table(path, self.n_pulses, self.float_type)
+        start = 0
+        for t, x, y in self.chunks(chunk_size):
+            stop = start + len(x)
+            tm[start:stop + 1] = t
+            xm[start:stop] = x
+            ym[start:stop] = y
+            start = stop
+        tm.flush()
+
+
+def _get_deltat_deltax(experiment):
+    deltat = 1./process.get_laser_frequency(experiment)
+    deltax = process.get_mark_speed(experiment)*deltat
+    return deltat, deltax
+
+
+def _clip(px, py, dx, dy, half_width, half_height):
+    """Intersect the lines p + s*d with the rectangle centered at the origin.
+
+    Returns:
+        smin, smax: arrays, the line is inside for smin <= s <= smax (empty if
+            smin > smax).
+    """
+    smin = np.full(np.broadcast(px, py, dx, dy).shape, -np.inf)
+    smax = np.full_like(smin, np.inf)
+    for p, d, h in ((px, dx, half_width), (py, dy, half_height)):
+        p, d = np.broadcast_arrays(p, d)
+        parallel = np.abs(d) < 1e-15
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s0 = (-h - p) / d
+            s1 = ( h - p) / d
+        lo = np.where(parallel, np.where(np.abs(p) <= h, -np.inf, np.inf), np.minimum(s0, s1))
+        hi = np.where(parallel, np.where(np.abs(p) <= h,  np.inf, -np.inf), np.maximum(s0, s1))
+        smin = np.maximum(smin, lo)
+        smax = np.minimum(smax, hi)
+    return smin, smax
+
+
+def _get_vectors(px, py, dx, dy, smin, smax, bidirectional=True):
+    """Scan vectors p + s*d, smin <= s <= smax, dropping empty ones, every
+    other one reversed if bidirectional."""
+    px, py, dx, dy, smin, smax = np.broadcast_arrays(px, py, dx, dy, smin, smax)
+    keep = smin <= smax
+    px, py, dx, dy, smin, smax = (a[keep] for a in (px, py, dx, dy, smin, smax))
+    vectors = np.stack([px + smin * dx, py + smin * dy, px + smax * dx, py + smax * dy], axis=1)
+    if bidirectional:
+        vectors[1::2] = vectors[1::2, [2, 3, 0, 1]]
+    return vectors
+
+
+def _get_rotated_frame(angle, half_width, half_height):
+    """Unit vectors along (d) and across (n) the direction `angle`, and the
+    range of the projections of the rectangle on them."""
+    d = np.array([np.cos(angle), np.sin(angle)])
+    n = np.array([-d[1], d[0]])
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * [half_width, half_height]
+    u = corners @ d
+    s = corners @ n
+    return d, n, (u.min(), u.max()), (s.min(), s.max())
+
+
+def _get_positions(lo, hi, spacing):
+    """Positions spaced `spacing` apart, centered in [lo, hi]."""
+    m = max(int(np.floor((hi - lo) / spacing)), 0) + 1
+    return (lo + hi) / 2 + (np.arange(m) - (m - 1) / 2) * spacing
+
+
+def get_hatching(width, height, hatch_distance, angle=0., experiment=0, float_type=np.float64):
+    """Bidirectional hatching of the rectangle width x height centered at the
+    origin, with lines at `angle` (radians) from the x-axis, `hatch_distance`
+    apart."""
+    hw, hh = width / 2, height / 2
+    d, n, _, (slo, shi) = _get_rotated_frame(angle, hw, hh)
+    s = _get_positions(slo, shi, hatch_distance)
+    px, py = s * n[0], s * n[1]
+    smin, smax = _clip(px, py, d[0], d[1], hw, hh)
+    return Toolpath( _get_vectors(px, py, d[0], d[1], smin, smax)
+                   , *_get_deltat_deltax(experiment), float_type
+                   )
+
+
+def get_stripes(width, height, stripe_width, hatch_distance, angle=0., experiment=0, float_type=np.float64):
+    """Stripe scanning of the rectangle width x height centered at the origin.
+
+    The rectangle is divided in stripes `stripe_width` wide, along the
+    direction `angle` (radians) from the x-axis. Every stripe is filled with
+    short bidirectional hatches across the stripe, `hatch_distance` apart.
+    """
+    hw, hh = width / 2, height / 2
+    d, n, (ulo, uhi), (slo, shi) = _get_rotated_frame(angle, hw, hh)
+    u = _get_positions(ulo, uhi, hatch_distance)
+    # the hatches are lines across the stripes, p = u*d, direction n
+    px, py = u * d[0], u * d[1]
+    smin, smax = _clip(px, py, n[0], n[1], hw, hh)
+    n_stripes = max(int(np.ceil((shi - slo) / stripe_width)), 1)
+    vectors = []
+    for k in range(n_stripes):
+        s0 = slo + k * stripe_width
+        vectors.append(_get_vectors( px, py, n[0], n[1]
+                                   , np.maximum(smin, s0), np.minimum(smax, s0 + stripe_width)
+                                   ))
+    return Toolpath(np.concatenate(vectors), *_get_deltat_deltax(experiment), float_type)
+
+
+def get_chessboard(width, height, island_size, hatch_distance, experiment=0, float_type=np.float64):
+    """Island (chessboard) scanning of the rectangle width x height centered
+    at the origin.
+
+    The rectangle is divided in square islands of `island_size`, scanned row
+    by row. Every island is filled with bidirectional hatches,
+    `hatch_distance` apart, along x and y for the white and black squares.
+    """
+    hw, hh = width / 2, height / 2
+    nx = max(int(np.ceil(width / island_size)), 1)
+    ny = max(int(np.ceil(height / island_size)), 1)
+    vectors = []
+    for iy in range(ny):
+        y0 = -hh + iy * island_size
+        y1 = min(y0 + island_size, hh)
+        for ix in range(nx):
+            x0 = -hw + ix * island_size
+            x1 = min(x0 + island_size, hw)
+            if (ix + iy) % 2 == 0:
+                yh = _get_positions(y0, y1, hatch_distance)
+                vectors.append(_get_vectors(0., yh, 1., 0., x0, x1))
+            else:
+                xh = _get_positions(x0, x1, hatch_distance)
+                vectors.append(_get_vectors(xh, 0., 0., 1., y0, y1))
+    return Toolpath(np.concatenate(vectors), *_get_deltat_deltax(experiment), float_type)
+
+
+def get_contours(width, height, n_contours, offset, experiment=0, float_type=np.float64):
+    """Contour scanning: `n_contours` concentric rectangles, starting with the
+    boundary of the rectangle width x height centered at the origin, every
+    next one `offset` further inside. Every contour is traced counterclockwise
+    from its lower left corner."""
+    vectors = []
+    for k in range(n_contours):
+        hw = width / 2 - k * offset
+        hh = height / 2 - k * offset
+        if hw < 0 or hh < 0:
+            break
+        corners = [(-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh), (-hw, -hh)]
+        vectors.extend(c0 + c1 for c0, c1 in zip(corners[:-1], corners[1:]))
+    return Toolpath(vectors, *_get_deltat_deltax(experiment), float_type)
+
+
 if __name__ == '__main__':
     t,x,y = generate_square(1,0)
     print('-*# finished #*-')
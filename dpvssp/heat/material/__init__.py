@@ -7,12 +7,121 @@ read process parameters from file.
 """
 
 import sys
+from functools import lru_cache
 from wiptools import get_workspace_dir
 
 sys.path.insert(0, str(get_workspace_dir(__file__) / 'exponential_decay'))
 
 from exponential_decay import rho, get_material_polynomials, get_material_slopes
 
+import numpy as np
+try:
+    from numba import njit
+    has_numba = True
+except:
+    has_numba = False
+
+
+def get_material_coefficients(float_type=np.float64):
+    """Coefficients of the material polynomials, highest power first.
+
+    Compiled kernels cannot call the polynomial objects returned by
+    `get_material_polynomials`, they evaluate the coefficient arrays with
+    Horner's rule instead.
+
+    Returns:
+        ca, cc: arrays of dtype `float_type` with the coefficients of the
+            diffusivity and the heat capacity polynomial.
+    """
+    pola, polc = get_material_polynomials(float_type)
+    ca = np.asarray(pola.coeffs, dtype=float_type)
+    cc = np.asarray(polc.coeffs, dtype=float_type)
+    return ca, cc
+
+
+# Clipping range of the temperature in compute_Txy.
+T_MIN = 0.
+T_MAX = 1073.
+
+
+class MaterialTable:
+    """Piecewise linear interpolation of a material polynomial on a uniform
+    temperature grid over [T_MIN, T_MAX].
+
+    A drop-in replacement for the polynomial objects returned by
+    `get_material_polynomials`: evaluation is a table lookup and one
+    multiply-add, independent of the degree of the polynomial.
+
+    Args:
+        pol: the polynomial to tabulate (a `np.poly1d`).
+        float_type: dtype of the table and of the results.
+        tol: upper bound on the relative error against `pol`. The grid is
+            refined until the error, measured in between the nodes, is below
+            tol/2.
+    """
+    def __init__(self, pol, float_type=np.float64, tol=1e-6, Tmin=T_MIN, Tmax=T_MAX):
+        self.float_type = float_type
+        self.Tmin = Tmin
+        pol = np.poly1d(np.asarray(pol.coeffs, dtype=np.float64))
+        n = 64
+        while True:
+            T = np.linspace(Tmin, Tmax, n + 1)
+            y = pol(T)
+            # interpolation error is measured at 3 points in every interval
+            f = np.array([0.25, 0.5, 0.75])[:, np.newaxis]
+            Ts = T[:-1] + f * (T[1:] - T[:-1])
+            ys = y[:-1] + f * (y[1:] - y[:-1])
+            err = np.abs(ys - pol(Ts)) / np.abs(pol(Ts))
+            if err.max() <= 0.5 * tol:
+                break
+            n *= 2
+            if n > 2**22:
+                raise ValueError(f"Cannot tabulate {pol} with relative error below {tol}.")
+        self.n = n
+        self.err = err.max()
+        self.inv_h = float_type(n / (Tmax - Tmin))
+        self.y  = y.astype(float_type)
+        # slopes, with a trailing 0. so that T == Tmax needs no special case
+        self.dy = np.append(np.diff(y), 0.).astype(float_type)
+
+    def __call__(self, T):
+        """Interpolate at the (clipped) temperatures `T`."""
+        Tmin = self.float_type(self.Tmin)
+        if has_numba:
+            result = np.empty_like(T)
+            _interpolate(T, Tmin, self.inv_h, self.y, self.dy, result)
+            return result
+        u = (T - Tmin) * self.inv_h
+        ufloor = np.floor(u)
+        i = np.minimum(ufloor.astype(np.intp), self.n)
+        return self.y[i] + (u - ufloor) * self.dy[i]
+
+
+if has_numba:
+    @njit
+    def _interpolate(T, Tmin, inv_h, y, dy, result):
+        """Linear interpolation in the table `y` with nodes
+        `Tmin + i/inv_h`, for `Tmin <= T <= Tmax`."""
+        n = len(y) - 1
+        for j in range(T.shape[0]):
+            u = (T[j] - Tmin) * inv_h
+            i = min(int(u), n)
+            result[j] = y[i] + (u - i) * dy[i]
+
+
+@lru_cache
+def get_material_tables(float_type=np.float64, tol=1e-6):
+    """Tabulated material polynomials, cached per float type and tolerance.
+
+    Returns:
+        taba, tabc: `MaterialTable`s for the diffusivity and the heat
+            capacity.
+    """
+    pola, polc = get_material_polynomials(float_type)
+    taba = MaterialTable(pola, float_type, tol)
+    tabc = MaterialTable(polc, float_type, tol)
+    return taba, tabc
+
 
 if __name__ == '__main__':
     a,c = get_material_polynomials()
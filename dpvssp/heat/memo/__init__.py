@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module memo
+
+Opt-in on-disk memoisation of `compute_Txy` and `geometry.generate_square`.
+
+Results are stored as .npy files in `results/` of the dpvssp cache directory
+(`~/.cache/dpvssp` or `$DPVSSP_CACHE_DIR`), named after a sha256 hash of the
+input arrays (dtype, shape and data), the keyword arguments and the dpvssp
+version. A hit is memory mapped read-only, nothing is copied. When the cache
+exceeds its size limit, the least recently used results are removed.
+
+    from dpvssp.heat import memo
+    t,x,y = memo.generate_square(199, experiment=0)
+    T = memo.compute_Txy(t, x, y, T0=300, experiment=0)
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import dpvssp
+from dpvssp.heat.autotune import get_cache_dir
+from dpvssp.heat.reltime import RelativeTimes
+
+# Default size limit of the cache (bytes).
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+# compute_Txy arguments that do not change the result.
+_IGNORED = ('verbose', 'report_n_clipped', 'n_threads', 'chunk_size')
+
+
+def _update(h, a):
+    """Add the array `a` (dtype, shape and data) to the hash `h`, in chunks so
+    that memory mapped arrays are not loaded as a whole."""
+    a = np.asarray(a)
+    h.update(f'{a.dtype.str}{a.shape}'.encode())
+    a = a.reshape(-1)
+    chunk_size = max((1 << 24) // max(a.itemsize, 1), 1)
+    for start in range(0, len(a), chunk_size):
+        h.update(np.ascontiguousarray(a[start:start + chunk_size]).data)
+
+
+def _to_json(value):
+    """json conversion of numpy scalars. Other objects (callables, ...) have
+    no stable representation and cannot be keyed."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} cannot be keyed')
+
+
+def get_key(name, arrays=(), **kwargs):
+    """Hash of a function name, its array arguments and its other keyword
+    arguments. Array valued keyword arguments are hashed like the array
+    arguments, the others must be json serialisable.
+
+    Raises:
+        ValueError: if a keyword argument cannot be keyed.
+    """
+    h = hashlib.sha256()
+    h.update(f'{name}-{dpvssp.__version__}'.encode())
+    for a in arrays:
+        _update(h, a)
+    options = {}
+    for option, value in sorted(kwargs.items()):
+        if isinstance(value, np.ndarray):
+            h.update(option.encode())
+            _update(h, value)
+        else:
+            options[option] = value
+    try:
+        h.update(json.dumps(options, sort_keys=True, default=_to_json).encode())
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Cannot key the arguments of {name}: {e}') from None
+    return h.hexdigest()
+
+
+def _touch(path):
+    """Set the modification time of `path` to now. File system timestamps
+    are typically taken from a coarse clock, which would not order accesses
+    in quick succession."""
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+class ResultCache:
+    """A directory of .npy files with a size limit and LRU eviction.
+
+    The last access time is the modification time of the file, which is
+    updated on every hit.
+
+    Args:
+        cache_dir: directory of the cache, default `results/` in the dpvssp
+            cache directory.
+        max_bytes: size limit (bytes).
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = get_cache_dir() / 'results' if cache_dir is None else Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def _path(self, key, k):
+        return self.cache_dir / f'{key}-{k}.npy'
+
+    def get(self, key, n_arrays=1):
+        """The memory mapped result(s) stored under `key`, or None."""
+        paths = [self._path(key, k) for k in range(n_arrays)]
+        try:
+            result = tuple(np.load(path, mmap_mode='r') for path in paths)
+            for path in paths:
+                _touch(path)
+        except FileNotFoundError:
+            # never stored, or (partly) evicted
+            return None
+        return result if n_arrays > 1 else result[0]
+
+    def put(self, key, result):
+        """Store an array or a tuple of arrays under `key`, then evict other
+        results."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        arrays = result if isinstance(result, tuple) else (result,)
+        for k, a in enumerate(arrays):
+            path = self._path(key, k)
+            # atomic, concurrent readers never see a partial file
+            tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp, 'wb') as f:
+                np.save(f, a)
+            tmp.replace(path)
+            _touch(path)
+        self.evict(keep=key)
+
+    def get_or_compute(self, key, compute, n_arrays=1):
+        """The result stored under `key`, if any, otherwise store and return
+        `compute()` (memory mapped, so that hits and misses return the same
+        kind of array)."""
+        result = self.get(key, n_arrays)
+        if result is None:
+            self.n_misses += 1
+            computed = compute()
+            self.put(key, computed)
+            result = self.get(key, n_arrays)
+            if result is None:
+                # evicted in the meantime by another process
+                result = computed
+        else:
+            self.n_hits += 1
+        return result
+
+    def get_size(self):
+        """Total size of the stored results (bytes)."""
+        return sum(path.stat().st_size for path in self.cache_dir.glob('*.npy'))
+
+    def evict(self, keep=None):
+        """Remove the least recently used results until the cache is within
+        its size limit. The result stored under the key `keep` is never
+        removed, even if it alone exceeds the limit."""
+        entries = []
+        size = 0
+        for path in self.cache_dir.glob('*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            if keep is None or not path.name.startswith(f'{keep}-'):
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        for mtime, nbytes, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= nbytes
+
+    def clear(self):
+        """Remove all results."""
+        for path in self.cache_dir.glob('*.npy'):
+            path.unlink(missing_ok=True)
+
+    def compute_Txy(self, t, x, y=0.0, **kwargs):
+        """Memoised `dpvssp.heat.compute_Txy`.
+
+        Returns:
+            T: read-only memory mapped array.
+            event: only with `watch`, as returned by `compute_Txy`.
+        """
+        from dpvssp.heat import compute_Txy
+        for name in ('out', 'pulse_index', 'reductions', 'stats'):
+            if kwargs.get(name) is not None:
+                raise ValueError(f'Arg {name} is not supported by the result cache')
+        if callable(kwargs.get('watch')):
+            raise ValueError('A callable watch is not supported by the result cache')
+        options = {name: value for name, value in kwargs.items() if name not in _IGNORED}
+        y_array = y if isinstance(y, np.ndarray) else np.asarray(y, dtype=t.dtype)
+        if isinstance(t, RelativeTimes):
+            t_arrays = (t.origins, t.deltas)
+            options['block_size'] = t.block_size
+        else:
+            t_arrays = (t,)
+        key = get_key('compute_Txy', t_arrays + (x, y_array), **options)
+        if kwargs.get('watch') is None:
+            return self.get_or_compute(key, lambda: compute_Txy(t, x, y, **kwargs))
+
+        def compute():
+            # the event is stored as a second array, -1 for None
+            T, event = compute_Txy(t, x, y, **kwargs)
+            return T, np.array(-1 if event is None else event)
+        T, event = self.get_or_compute(key, compute, n_arrays=2)
+        return T, (None if event < 0 else int(event))
+
+    def generate_square(self, n, experiment, float_type=np.float64):
+        """Memoised `dpvssp.heat.geometry.generate_square`.
+
+        Returns:
+            t, x, y: read-only memory mapped arrays.
+        """
+        from dpvssp.heat.geometry import generate_square
+        key = get_key('generate_square', n=n, experiment=experiment, float_type=np.dtype(float_type).str)
+        return self.get_or_compute(key, lambda: generate_square(n, experiment, float_type), n_arrays=3)
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """The `ResultCache` in the dpvssp cache directory."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+
+def compute_Txy(t, x, y=0.0, cache=None, **kwargs):
+    """Memoised `dpvssp.heat.compute_Txy`, see `ResultCache.compute_Txy`.
+
+    Args:
+        cache: a `ResultCache`, default `get_default_cache()`.
+    """
+    return (cache or get_default_cache()).compute_Txy(t, x, y, **kwargs)
+
+
+def generate_square(n, experiment, float_type=np.float64, cache=None):
+    """Memoised `dpvssp.heat.geometry.generate_square`, see
+    `ResultCache.generate_square`.
+
+    Args:
+        cache: a `ResultCache`, default `get_default_cache()`.
+    """
+    return (cache or get_default_cache()).generate_square(n, experiment, float_type)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module pulsetable
+
+Pulse tables `(t,x,y)` on disk, for tables that do not fit in memory.
+
+File layout (little endian):
+
+    offset  size
+         0     8  magic b'DPVSSPPT'
+         8     4  uint32, format version (1)
+        12     4  dtype of the arrays, numpy dtype string, e.g. b'<f8',
+                  padded with b'\\0'
+        16     8  uint64, n_pulses
+        24    40  reserved (zero)
+        64        t, n_pulses+1 items
+                  x, n_pulses items
+                  y, n_pulses items
+
+`open_pulse_table` maps the arrays with `np.memmap`, so that they can be
+passed to `compute_Txy` as they are. For the results, use a memory mapped
+.npy file as `out`, e.g. `np.lib.format.open_memmap(path, mode='w+', ...)`,
+and `chunk_size` to bound the memory `compute_Txy` uses.
+"""
+
+import numpy as np
+
+MAGIC = b'DPVSSPPT'
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER = np.dtype([ ('magic', 'S8'), ('version', '<u4'), ('dtype', 'S4')
+                   , ('n_pulses', '<u8'), ('reserved', 'V40')
+                   ])
+
+
+def _get_dtype(float_type):
+    dtype = np.dtype(float_type).newbyteorder('<')
+    if dtype.type not in (np.float64, np.float32):
+        raise NotImplementedError(f"Unsupported float type {float_type}")
+    return dtype
+
+
+def _map(path, mode, dtype, n_pulses):
+    """Memory map t, x and y."""
+    n = (n_pulses + 1) + 2 * n_pulses
+    data = np.memmap(path, dtype=dtype, mode=mode, offset=HEADER_SIZE, shape=(n,))
+    t = data[:n_pulses + 1]
+    x = data[n_pulses + 1:2 * n_pulses + 1]
+    y = data[2 * n_pulses + 1:]
+    return t, x, y
+
+
+def create_pulse_table(path, n_pulses, float_type=np.float64):
+    """Create a pulse table file for n_pulses pulses.
+
+    Returns:
+        t, x, y: writable memory mapped arrays, to be filled by the caller
+            (e.g. in chunks).
+    """
+    dtype = _get_dtype(float_type)
+    header = np.zeros((), dtype=_HEADER)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['dtype'] = dtype.str.encode()
+    header['n_pulses'] = n_pulses
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+    return _map(path, 'r+', dtype, n_pulses)
+
+
+def write_pulse_table(path, t, x, y, chunk_size=1 << 20):
+    """Write the pulse table (t,x,y) to a file, in chunks of chunk_size items."""
+    if not isinstance(y, np.ndarray):
+        y = np.full_like(x, y)
+    if not (len(t) == len(x) + 1 and len(y) == len(x)):
+        raise ValueError('Expecting len(t) == len(x) + 1 == len(y) + 1')
+    tm, xm, ym = create_pulse_table(path, len(x), t.dtype.type)
+    for a, am in ((t, tm), (x, xm), (y, ym)):
+        for start in range(0, len(a), chunk_size):
+            am[start:start + chunk_size] = a[start:start + chunk_size]
+    tm.flush()
+
+
+def read_header(path):
+    """Returns the dtype and the number of pulses of a pulse table file."""
+    header = np.fromfile(path, dtype=_HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != MAGIC:
+        raise ValueError(f'{path} is not a pulse table file')
+    if header['version'][0] != VERSION:
+        raise ValueError(f"{path}: unsupported pulse table version {header['version'][0]}")
+    dtype = np.dtype(header['dtype'][0].decode())
+    return dtype, int(header['n_pulses'][0])
+
+
+def open_pulse_table(path, mode='r'):
+    """Memory map a pulse table file.
+
+    Returns:
+        t, x, y: memory mapped arrays (read-only for mode='r').
+    """
+    dtype, n_pulses = read_header(path)
+    # the native dtype object, compute_Txy compares dtypes by identity
+    return _map(path, mode, np.dtype(dtype.type) if dtype.isnative else dtype, n_pulses)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module reductions
+
+Summary statistics of a temperature history, computed incrementally from the
+time tiles of `compute_Txy` as they become final:
+
+* the peak temperature and its time,
+* the time above a threshold,
+* the number of samples above the clipping limit `material.T_MAX`,
+* a downsampled history (every `stride`-th sample).
+
+    r = Reductions(t0=t[0], threshold=600., stride=100)
+    compute_Txy(t, x, y, reductions=r, chunk_size=4096)
+    print(r.T_max, r.time_above, r.n_clipped)
+
+With `chunk_size` and without `out`, `compute_Txy` does not store the full
+history at all, its memory use is then bounded by `chunk_size` and `stride`.
+"""
+
+import numpy as np
+
+import dpvssp.heat.material as material
+
+
+class Reductions:
+    """Incremental summary of a temperature history.
+
+    Args:
+        t0: time before the first sample, the first sample covers the
+            interval (t0, t[0]] (t[0] for `compute_Txy`).
+        threshold: temperature (K) for `time_above` and `n_above`, None to
+            skip these.
+        stride: keep every stride-th sample in the downsampled history, None
+            for no history.
+
+    Attributes:
+        n: number of samples seen.
+        T_max, t_max: the peak temperature and its (first) time.
+        time_above: total time (s) above `threshold`. Every sample stands
+            for the interval since the previous sample.
+        n_above: number of samples above `threshold`.
+        n_clipped: number of samples above `material.T_MAX`.
+    """
+    def __init__(self, t0=0., threshold=None, stride=None):
+        self.threshold = threshold
+        self.stride = stride
+        self.n = 0
+        self.T_max = -np.inf
+        self.t_max = None
+        self.time_above = 0.
+        self.n_above = 0
+        self.n_clipped = 0
+        self._t_last = t0
+        self._history_t = []
+        self._history_T = []
+
+    def update(self, t, T):
+        """Add the samples T at times t (the next ones in time)."""
+        if len(T) == 0:
+            return
+        j = np.argmax(T)
+        if T[j] > self.T_max:
+            self.T_max = T[j].item()
+            self.t_max = t[j].item()
+        self.n_clipped += int(np.count_nonzero(T > material.T_MAX))
+        if self.threshold is not None:
+            above = T > self.threshold
+            self.n_above += int(np.count_nonzero(above))
+            dt = np.diff(t, prepend=t.dtype.type(self._t_last))
+            self.time_above += dt[above].sum(dtype=np.float64).item()
+        if self.stride:
+            # samples 0, stride, 2*stride, ... of the whole history
+            first = -self.n % self.stride
+            self._history_t.append(np.array(t[first::self.stride]))
+            self._history_T.append(np.array(T[first::self.stride]))
+        self.n += len(T)
+        self._t_last = t[-1]
+
+    def get_history(self):
+        """The downsampled history.
+
+        Returns:
+            t, T: arrays, every stride-th sample.
+        """
+        if not self._history_T:
+            return np.empty(0), np.empty(0)
+        self._history_t = [np.concatenate(self._history_t)]
+        self._history_T = [np.concatenate(self._history_T)]
+        return self._history_t[0], self._history_T[0]
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python (sub)module reltime
+
+Relative-time encoding of the pulse times `t`, for long jobs in single
+precision.
+
+A float32 time `t` of a long job cannot resolve the time between pulses:
+after an hour, consecutive float32 times are about 2.4e-4 s apart. The
+encoding stores the times in blocks of `block_size` pulses: a float64
+origin per block and the time relative to the origin of its block in the
+float type of the computation,
+
+    t[i] = origins[i // block_size] + deltas[i]
+
+The deltas are small in magnitude, so the times are stored with the
+resolution of a short job. `compute_Txy` accepts the encoding for `t`: the
+engines run in the float type of the deltas, and the times that must be
+exact (the times of `at` and the times passed to `watch` and `reductions`)
+are taken in float64 from the encoding.
+
+    t,x,y = generate_square(999, experiment=0, float_type=np.float32, relative=True)
+    T = compute_Txy(t, x, y, at=[...])
+
+With `chunk_size`, `compute_Txy` reads the times through a `TimesView`, which
+generates them per tile and chunk, so that the decoded times never take
+memory proportional to the number of pulses.
+"""
+
+import numpy as np
+
+# Default number of pulses per block.
+DEFAULT_BLOCK_SIZE = 1024
+
+
+class RelativeTimes:
+    """Pulse times as float64 block origins plus in-block deltas.
+
+    Args:
+        origins: float64 array, the origin of every block.
+        deltas: array of float32 or float64, the times relative to the
+            origin of their block.
+        block_size: number of times per block.
+    """
+    def __init__(self, origins, deltas, block_size=DEFAULT_BLOCK_SIZE):
+        if deltas.dtype.type not in (np.float64, np.float32):
+            raise NotImplementedError(f"Unsupported dtype {deltas.dtype}")
+        if len(origins) != -(-len(deltas) // block_size):
+            raise ValueError('Expecting one origin per block of deltas')
+        self.origins = np.asarray(origins, dtype=np.float64)
+        self.deltas = deltas
+        self.block_size = block_size
+
+    @classmethod
+    def from_absolute(cls, t, block_size=DEFAULT_BLOCK_SIZE, float_type=np.float32):
+        """Encode the absolute times `t` (float64)."""
+        t = np.asarray(t, dtype=np.float64)
+        origins = np.array(t[::block_size])
+        deltas = (t - np.repeat(origins, block_size)[:len(t)]).astype(float_type)
+        return cls(origins, deltas, block_size)
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @property
+    def dtype(self):
+        """The dtype of the deltas, i.e. of the computation."""
+        return self.deltas.dtype
+
+    def get_absolute(self, index=np.s_[:]):
+        """The absolute times `t[index]` (float64), `index` a slice or an
+        int array."""
+        if isinstance(index, slice):
+            # O(len(index)), not O(len(self))
+            j = np.arange(*index.indices(len(self)))
+        else:
+            j = np.asarray(index)
+            if j.dtype == bool:
+                j = np.flatnonzero(j)
+            j = np.where(j < 0, j + len(self), j)
+            if np.any(j < 0) or np.any(j >= len(self)):
+                raise IndexError(f'index out of range for {len(self)} times')
+        return self.origins[j // self.block_size] + self.deltas[j]
+
+    def get_times(self, index=np.s_[:]):
+        """The absolute times `t[index]`, rounded once to the float type of
+        the deltas."""
+        return self.get_absolute(index).astype(self.dtype)
+
+
+class TimesView:
+    """The times `t[start:]` of a `RelativeTimes`, decoded on access.
+
+    Supports `len`, indexing with an int, a slice or an int array (returns a
+    numpy array) and `np.searchsorted`, with the results of the same
+    operations on the decoded array, in O(block_size) memory.
+
+    Args:
+        times: a `RelativeTimes`.
+        start: index into `times` of the first time of the view.
+        exact: if True, the times are float64 (`get_absolute`), otherwise
+            rounded to the float type of the deltas (`get_times`).
+    """
+    def __init__(self, times, start=0, exact=False):
+        self.times = times
+        self.start = start
+        self.exact = exact
+
+    def __len__(self):
+        return len(self.times) - self.start
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float64) if self.exact else self.times.dtype
+
+    def _get(self, j):
+        """The times at the indices j into `times`."""
+        if self.exact:
+            return self.times.get_absolute(j)
+        return self.times.get_times(j)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            j = np.arange(*index.indices(len(self)))
+        else:
+            j = np.asarray(index)
+            if np.any(j < -len(self)) or np.any(j >= len(self)):
+                raise IndexError(f'index out of range for {len(self)} times')
+            j = np.where(j < 0, j + len(self), j)
+        return self._get(j + self.start)
+
+    def searchsorted(self, v, side='left', sorter=None):
+        """`np.searchsorted(t[start:], v, side)`: the blocks are located from
+        their first times, the indices within a block from its times."""
+        if sorter is not None:
+            raise NotImplementedError('sorter is not supported')
+        times = self.times
+        block_size = times.block_size
+        v = np.asarray(v)
+        vs = v.ravel()
+        # t[b*block_size] <(=) v <(=) t[(b+1)*block_size]
+        b = np.searchsorted(self._get(np.arange(0, len(times), block_size)), vs, side) - 1
+        indices = np.zeros(len(vs), dtype=np.int64)
+        for block in np.unique(b[b >= 0]):
+            where = b == block
+            start = block * block_size
+            tb = self._get(np.arange(start, min(start + block_size, len(times))))
+            indices[where] = start + np.searchsorted(tb, vs[where], side)
+        indices = np.maximum(indices - self.start, 0)
+        return indices.reshape(v.shape) if v.ndim else indices[0]
@@ -87,6 +87,43 @@ class RuntimeTable:
             self.data[ir + 3].append(speedup)
             self.widths[-1] = max(self.widths[-1], len(self.format(speedup)))
 
+    def add_speedup_threads(self, n_threads):
+        """Add columns for the speedup and parallel efficiency with respect to
+        the first row. `n_threads[i]` is the number of threads of row i+1."""
+
+        self.data[0].extend(['speedup', 'eff'])
+        self.widths.extend([7, 4])
+        for ir in range(1, self.nrows):
+            speedup = self.data[ir][3] / self.data[1][3]
+            efficiency = speedup * n_threads[0] / n_threads[ir - 1]
+            self.data[ir].extend([speedup, efficiency])
+            self.widths[-2] = max(self.widths[-2], len(self.format(speedup)))
+            self.widths[-1] = max(self.widths[-1], len(self.format(efficiency)))
+
+    def add_column(self, name, values):
+        """Add a column `name`, `values[i]` is the value of row i+1."""
+
+        self.data[0].append(name)
+        self.widths.append(len(name))
+        for ir in range(1, self.nrows):
+            self.data[ir].append(values[ir - 1])
+            self.widths[-1] = max(self.widths[-1], len(self.format(values[ir - 1])))
+
+    def add_bandwidth(self, bytes_per_eval, label=''):
+        """Add columns for the memory traffic per evaluation and the resulting
+        bandwidth. `bytes_per_eval[i]` is the number of bytes moved per
+        evaluation of row i+1. `label` prefixes the column headers, e.g.
+        'model ' for an estimated rather than measured traffic."""
+
+        self.data[0].extend([f'{label}B/eval', f'{label}GB/s'])
+        self.widths.extend([len(label) + 6, len(label) + 4])
+        for ir in range(1, self.nrows):
+            nbytes = bytes_per_eval[ir - 1]
+            bandwidth = nbytes * self.data[ir][1] / self.data[ir][2] * 1e-9
+            self.data[ir].extend([nbytes, bandwidth])
+            self.widths[-2] = max(self.widths[-2], len(self.format(nbytes)))
+            self.widths[-1] = max(self.widths[-1], len(self.format(bandwidth)))
+
 
 def time_fun(fun, runtime_table, description, size, repetitions=10, **kwargs):
     """Time the function `fun(**kwargs)` with `repetitions` repetitions and
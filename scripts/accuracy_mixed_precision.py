@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python script for the accuracy and runtime of compute_Txy(precision='mixed')
+
+The temperatures in single and mixed precision are compared with the double
+precision result.
+"""
+
+import sys
+from wiptools import get_workspace_dir
+sys.path.insert(0, str(get_workspace_dir(__file__) / 'dpvssp'))
+
+from dpvssp.timing_tools import RuntimeTable, time_fun
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat import compute_Txy
+import numpy as np
+
+
+if __name__ == '__main__':
+    repetitions = 3
+    experiment = 0
+    ufunc = 'fused'
+    runtime_table = RuntimeTable(repetitions=repetitions)
+    errors = []
+    for n in (49, 99, 199):
+        t,x,y = generate_square(n, experiment, np.float64)
+        t32, x32, y32 = t.astype(np.float32), x.astype(np.float32), y.astype(np.float32)
+        size = len(x) * (len(x) + 1) // 2
+        T64 = compute_Txy(t, x, y, T0=300, experiment=experiment, ufunc=ufunc)
+        for precision, args, kwargs in ( ('double', (t, x, y), {})
+                                       , ('single', (t32, x32, y32), {})
+                                       , ('mixed' , (t, x, y), {'precision': 'mixed'})
+                                       ):
+            description = f'{2*n+1}x{2*n+1}_{precision}'
+            time_fun( compute_Txy, runtime_table, description, size, repetitions=repetitions
+                    , t=args[0], x=args[1], y=args[2], T0=300, experiment=experiment, ufunc=ufunc, **kwargs
+                    )
+            T = compute_Txy(*args, T0=300, experiment=experiment, ufunc=ufunc, **kwargs)
+            errors.append(np.abs(T - T64).max() / np.abs(T64).max())
+    runtime_table.add_performance()
+    runtime_table.add_column('max rel err', errors)
+    runtime_table.print()
+    print('-*# finished #*-')
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python script for timing compute_Txy(ufunc='fused') against the default numpy engine
+
+The memory traffic is a model, not a measurement: it counts the passes over
+the time slice of a pulse (one pass reads or writes one array) in both
+engines, assuming that no array stays in cache between operations. The
+columns are labelled 'model B/eval' and 'model GB/s' accordingly.
+"""
+
+import sys
+from wiptools import get_workspace_dir
+sys.path.insert(0, str(get_workspace_dir(__file__) / 'dpvssp'))
+
+from dpvssp.timing_tools import RuntimeTable, time_fun
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat import compute_Txy
+import dpvssp.heat.material as material
+from numpy import float32, float64
+
+
+def passes_per_eval(ufunc, degree):
+    """Number of array passes per evaluation (time and pulse) of the engine
+    `ufunc` for material polynomials of degree `degree`."""
+    if ufunc == '':
+        return ( 2                      # clip
+               + 2 * (5 * degree + 8)   # np.polyval (zeros_like, d+1 times y*x+p) and copy into _a, _c
+               + 7                      # _a4dt
+               + 4                      # _a4dtw2
+               + 17                     # Trise, 7 operations
+               + 3                      # T += Trise
+               )
+    elif ufunc == 'fused':
+        return ( 2                      # clip
+               + 2 * (5 * degree - 1)   # Horner with out=
+               + 23                     # 9 operations with out=
+               + 3                      # T += Trise
+               )
+    raise NotImplementedError(f'ufunc `{ufunc}` not supported')
+
+
+if __name__ == '__main__':
+    repetitions = 5
+    experiment = 0
+    for n in (49, 99):
+        runtime_table = RuntimeTable(repetitions=repetitions)
+        bytes_per_eval = []
+        for ufunc in ('', 'fused'):
+            for float_type in (float64, float32):
+                t,x,y = generate_square(n, experiment, float_type)
+                pola, polc = material.get_material_polynomials(float_type)
+                description = f'{float_type.__name__}_{2*n+1}x{2*n+1}_{ufunc or "numpy"}'
+                size = len(x) * (len(x) + 1) // 2
+                time_fun( compute_Txy, runtime_table, description, size, repetitions=repetitions
+                        , t=t, x=x, y=y, T0=300, experiment=experiment, ufunc=ufunc
+                        )
+                bytes_per_eval.append(passes_per_eval(ufunc, pola.order) * float_type(0).itemsize)
+        runtime_table.add_performance()
+        runtime_table.add_speedup_precision()
+        runtime_table.add_bandwidth(bytes_per_eval, label='model ')
+        runtime_table.print()
+    print('-*# finished #*-')
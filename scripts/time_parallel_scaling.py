@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+## Python script for timing the strong scaling of compute_Txy(ufunc='parallel')
+"""
+
+import sys
+from wiptools import get_workspace_dir
+sys.path.insert(0, str(get_workspace_dir(__file__) / 'dpvssp'))
+
+from dpvssp.timing_tools import RuntimeTable, time_fun
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat import compute_Txy
+from numba import config
+from numpy import float32, float64
+
+
+if __name__ == '__main__':
+    repetitions = 5
+    experiment = 0
+    n = 199
+    n_threads = [1]
+    while 2 * n_threads[-1] <= config.NUMBA_NUM_THREADS:
+        n_threads.append(2 * n_threads[-1])
+    if n_threads[-1] < config.NUMBA_NUM_THREADS:
+        n_threads.append(config.NUMBA_NUM_THREADS)
+
+    for float_type in (float64, float32):
+        runtime_table = RuntimeTable(repetitions=repetitions)
+        t,x,y = generate_square(n, experiment, float_type)
+        size = len(x) * (len(x) + 1) // 2
+        # compile the kernel for this float type, outside the timings
+        compute_Txy(t[:3], x[:2], y[:2], T0=300, experiment=experiment, ufunc='parallel')
+        for nt in n_threads:
+            description = f'{float_type.__name__}_{2*n+1}x{2*n+1}_parallel_{nt}'
+            time_fun( compute_Txy, runtime_table, description, size, repetitions=repetitions
+                    , t=t, x=x, y=y, T0=300, experiment=experiment, ufunc='parallel', n_threads=nt
+                    )
+        runtime_table.add_performance()
+        runtime_table.add_speedup_threads(n_threads)
+        runtime_table.print()
+    print('-*# finished #*-')
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.cache_info."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.cache_info as cache_info
+
+
+def test_parse_size():
+    assert cache_info._parse_size('48K\n') == 48 * 1024
+    assert cache_info._parse_size('2048K') == 2 * 1024 * 1024
+    assert cache_info._parse_size('32768') == 32768
+
+
+def test_get_tile_size():
+    sizes = cache_info.get_cache_sizes()
+    assert sizes[1] <= sizes[2]
+    assert cache_info.get_tile_size(8, 4) == sizes[1] // 8 // 4
+    assert cache_info.get_tile_size(4, 4, level=2) == sizes[2] // 4 // 4
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_get_tile_size
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.executor."""
+
+import subprocess
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.executor as executor
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+import pytest
+
+
+def _get_jobs():
+    return [dict(experiment=experiment, T0=T0, xc=xc)
+            for experiment in (0, 1) for T0 in (300., 400.) for xc in (0., 2e-5)]
+
+
+def test_run_jobs():
+    t,x,y = generate_square(10, experiment=0)
+    jobs = _get_jobs()
+    T, stats = executor.run_jobs(t, x, y, jobs, n_workers=2)
+    assert T.shape == (len(jobs), len(x))
+    for k, job in enumerate(jobs):
+        assert np.array_equal(T[k], compute_Txy(t, x, y, **job))
+    assert sum(s['jobs'] for s in stats.values()) == len(jobs)
+
+
+def test_Coordinator():
+    t,x,y = generate_square(10, experiment=0)
+    jobs = _get_jobs()
+    coordinator = executor.Coordinator()
+    processes = executor.start_local_workers(coordinator.address, coordinator.authkey, 2)
+    try:
+        T, stats = coordinator.run(t, x, y, jobs, n_workers=2)
+    finally:
+        for process in processes:
+            process.join()
+        coordinator.close()
+    for k, job in enumerate(jobs):
+        assert np.array_equal(T[k], compute_Txy(t, x, y, **job))
+    assert sum(s['jobs'] for s in stats.values()) == len(jobs)
+
+
+
+def test_unsupported():
+    t,x,y = generate_square(3, experiment=0)
+    for job in (dict(at=[0, 1]), dict(watch=310.)):
+        with pytest.raises(ValueError):
+            executor.run_jobs(t, x, y, [job], n_workers=1)
+        coordinator = executor.Coordinator()
+        try:
+            with pytest.raises(ValueError):
+                coordinator.run(t, x, y, [job], n_workers=1)
+        finally:
+            coordinator.close()
+
+
+def test_Coordinator_timeout():
+    t,x,y = generate_square(3, experiment=0)
+    jobs = _get_jobs()
+    coordinator = executor.Coordinator()
+    try:
+        with pytest.raises(TimeoutError):
+            coordinator.run(t, x, y, jobs, n_workers=1, timeout=0.1)
+        # runs on the workers that connected
+        processes = executor.start_local_workers(coordinator.address, coordinator.authkey, 1)
+        try:
+            T, stats = coordinator.run(t, x, y, jobs, n_workers=2, timeout=5.)
+        finally:
+            for process in processes:
+                process.join()
+    finally:
+        coordinator.close()
+    assert len(stats) == 1
+    assert T.shape == (len(jobs), len(x))
+
+
+
+def test_workers_after_parallel():
+    # forked workers deadlock a parent that runs numba's threading layer
+    script = """if True:
+        import dpvssp.executor as executor
+        from dpvssp.heat import compute_Txy
+        from dpvssp.heat.geometry import generate_square
+        if __name__ == '__main__':
+            t,x,y = generate_square(3, experiment=0)
+            compute_Txy(t, x, y, ufunc='parallel')
+            executor.run_jobs(t, x, y, [dict(T0=300.)], n_workers=1)
+            coordinator = executor.Coordinator()
+            processes = executor.start_local_workers(coordinator.address, coordinator.authkey, 1)
+            coordinator.run(t, x, y, [dict(T0=300.)], n_workers=1)
+            for process in processes:
+                process.join()
+            coordinator.close()
+        """
+    result = subprocess.run([sys.executable, '-c', script], timeout=300)
+    assert result.returncode == 0
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_run_jobs
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
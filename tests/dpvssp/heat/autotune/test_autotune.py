@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.autotune."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.autotune as autotune
+from dpvssp.heat.reductions import Reductions
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import json
+import numpy as np
+
+
+def test_get_square():
+    for n_pulses in range(9, 2000):
+        t,x,y = autotune._get_square(n_pulses, 0, np.float64)
+        assert len(x) <= n_pulses < (np.sqrt(len(x)) + 2) ** 2
+
+
+def test_compute_Txy_auto(tmp_path, monkeypatch):
+    monkeypatch.setenv('DPVSSP_CACHE_DIR', str(tmp_path))
+    # a budget that is not a square number of pulses, independent of the
+    # speed of the machine
+    monkeypatch.setattr(autotune, 'get_max_tuning_pulses', lambda float_type, experiment=0: 429)
+    t,x,y = generate_square(5, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    Ta = compute_Txy(t, x, y, T0=300, ufunc='auto')
+    assert np.allclose(Ta, T, rtol=1e-12, atol=0)
+    cache = json.loads(autotune.get_cache_file().read_text())
+    max_tuning_pulses = cache['float64-max_tuning_pulses']
+    assert len(x) < max_tuning_pulses
+    key = f'float64-{autotune.get_bucket(len(x))}'
+    assert list(cache) == ['float64-max_tuning_pulses', key]
+    assert cache[key][0]['s'] == min(candidate['s'] for candidate in cache[key])
+    assert all(candidate['n_pulses'] == len(x) for candidate in cache[key])
+    # a tile would hold all times of the workload
+    assert not any(candidate['blocked'] for candidate in cache[key])
+
+    # larger problems share the ranking of the largest workload
+    ranking = autotune.get_ranking(np.float64, 10**6)
+    assert ranking == autotune.get_ranking(np.float64, max_tuning_pulses)
+    assert ranking[0]['n_pulses'] == 19 * 19
+
+    # served from the cache
+    monkeypatch.setattr(autotune, 'tune', None)
+    Ta = compute_Txy(t, x, y, T0=300, ufunc='auto', refresh_dT=0.)
+    assert np.allclose(Ta, T, rtol=1e-12, atol=0)
+    assert autotune.select(np.float64, len(x), options=('refresh_dT', 'exp_tol'))['ufunc'] == ''
+
+
+
+def test_compute_Txy_auto_exclude(tmp_path, monkeypatch):
+    # engines that do not support an option are not selected, even if they
+    # rank first
+    ranking = [{'ufunc': 'parallel', 'blocked': False, 's': 0.}, {'ufunc': '', 's': 1.}]
+    monkeypatch.setattr(autotune, 'get_ranking', lambda *args, **kwargs: ranking)
+    t,x,y = generate_square(5, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    threshold = 0.5 * (300 + T.max())
+    Tw, event = compute_Txy(t, x, y, T0=300, ufunc='auto', watch=threshold)
+    assert np.array_equal(Tw, T[:event + 1])
+    Tc = compute_Txy(t, x, y, T0=300, ufunc='auto', chunk_size=17)
+    assert np.allclose(Tc, T, rtol=1e-12, atol=0)
+    ranking.insert(0, {'ufunc': '', 'precision': 'mixed', 's': 0.})
+    Tc = compute_Txy(t, x, y, T0=300, ufunc='auto', precision='auto', chunk_size=17)
+    assert np.allclose(Tc, T, rtol=1e-12, atol=0)
+    ranking.pop(0)
+    Tc = compute_Txy(t, x, y, T0=300, ufunc='auto', checkpoint_file=tmp_path / 'T.npy')
+    assert np.allclose(Tc, T, rtol=1e-12, atol=0)
+    r = Reductions(t0=t[0])
+    compute_Txy(t, x, y, T0=300, ufunc='auto', reductions=r)
+    assert r.T_max == T.max()
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_compute_Txy_auto
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
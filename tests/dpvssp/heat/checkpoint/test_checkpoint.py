@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.checkpoint."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.checkpoint as checkpoint
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+import pytest
+
+
+class Killed(Exception):
+    pass
+
+
+def _kill_after(n_saves, monkeypatch):
+    """Make compute_Txy fail after n_saves checkpoints are written."""
+    save = checkpoint.Checkpointer.save
+    def save_and_kill(self, T, iblock, k):
+        save(self, T, iblock, k)
+        # wait for the background thread, to make the test deterministic
+        self._queue.join()
+        if self.n_written >= n_saves:
+            raise Killed()
+    monkeypatch.setattr(checkpoint.Checkpointer, 'save', save_and_kill)
+
+
+def test_resume(tmp_path, monkeypatch):
+    t,x,y = generate_square(10, experiment=0)
+    path = tmp_path / 'Txy.checkpoint'
+    for kwargs, position in ( (dict(), (0, 49)), (dict(tile_size=100), (0, 49))
+                            , (dict(ufunc='fused', tol=1e-4), (0, 49))
+                            # checkpoints at the start of every tile
+                            , (dict(ufunc='compiled', tile_size=10), (19, 0))
+                            ):
+        T = compute_Txy(t, x, y, T0=300, **kwargs)
+        with monkeypatch.context() as m:
+            _kill_after(50 if position[1] else 20, m)
+            with pytest.raises(Killed):
+                compute_Txy(t, x, y, T0=300, checkpoint_file=path, checkpoint_interval=0., **kwargs)
+        state = checkpoint.load(path, checkpoint._read_info(path)['key'])
+        assert state[1:3] == position
+        # another job cannot resume from it
+        with pytest.raises(ValueError):
+            compute_Txy(t, x, y, T0=400, checkpoint_file=path, resume=True, **kwargs)
+        # it was not overwritten by the other job, which failed before
+        # writing anything
+        Tr = compute_Txy(t, x, y, T0=300, checkpoint_file=path, resume=True, **kwargs)
+        assert np.array_equal(Tr, T)
+        assert not path.exists()
+
+
+
+def test_save(tmp_path, monkeypatch):
+    # only the tiles that changed since the slot was last written are copied
+    copied = []
+    write = checkpoint.Checkpointer._write
+    def record(self, slot, start, T, iblock, k):
+        copied.append((slot, start, len(T)))
+        write(self, slot, start, T, iblock, k)
+    monkeypatch.setattr(checkpoint.Checkpointer, '_write', record)
+    path = tmp_path / 'T.checkpoint'
+    T = np.zeros(1000)
+    checkpointer = checkpoint.Checkpointer(path, 'key', T, blocksize=100)
+    previous = 0
+    for iblock in (3, 5, 6, 9):
+        # as in the pulse loop: the tiles before the current one are final
+        T[previous * 100:(iblock + 1) * 100] += 1
+        previous = iblock
+        checkpointer.save(T, iblock, 0)
+        checkpointer._queue.join()
+        state = checkpoint.load(path, 'key')
+        assert np.array_equal(state[0], T)
+        assert state[1] == iblock
+    checkpointer.close()
+    assert copied == [(0, 0, 400), (1, 0, 600), (0, 300, 400), (1, 500, 500)]
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_resume
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
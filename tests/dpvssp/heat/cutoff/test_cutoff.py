@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.cutoff."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.cutoff as cutoff
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+
+
+def test_PulseIndex():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(-1., 1., 1000)
+    y = rng.uniform(-1., 1., 1000)
+    index = cutoff.PulseIndex(x, y, cell_size=0.1)
+    for xc, yc, r in ((0., 0., 0.25), (0.9, -0.3, 0.5), (5., 5., 1.)):
+        expected = np.flatnonzero((x - xc)**2 + (y - yc)**2 <= r * r)
+        assert np.array_equal(index.query(xc, yc, r), expected)
+
+
+def test_compute_Txy_tol():
+    t,x,y = generate_square(10, experiment=0)
+    index = cutoff.PulseIndex(x, y, cell_size=x[1] - x[0])
+    for xc in (0., 5 * (x[1] - x[0])):
+        T = compute_Txy(t, x, y, T0=300, xc=xc)
+        for tol in (1e-3, 1e-6):
+            Ttol = compute_Txy(t, x, y, T0=300, xc=xc, tol=tol)
+            assert np.all(np.abs(Ttol - T) <= len(x) * tol)
+            Tindex = compute_Txy(t, x, y, T0=300, xc=xc, tol=tol, pulse_index=index)
+            assert np.all(np.abs(Tindex - T) <= len(x) * tol)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_compute_Txy_tol
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
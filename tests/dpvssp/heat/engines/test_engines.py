@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.engines."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.engines as engines
+from dpvssp.heat import compute_Txy, has_numba
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat.reductions import Reductions
+
+import numpy as np
+import pytest
+
+
+def test_get_options():
+    assert engines.get_options() == ()
+    assert engines.get_options(refresh_dT=0., exp_tol=0, precision='auto') == ('refresh_dT', 'exp_tol')
+    assert engines.get_options(precision='mixed', chunk_size=17) == ('precision', 'chunk_size')
+
+
+def test_check():
+    assert engines.supports('', ('refresh_dT', 'exp_tol', 'precision', 'watch'))
+    assert not engines.supports('fused', ('refresh_dT',))
+    assert not engines.supports('', ('chunk_size', 'precision'))
+    assert not engines.supports('numpy', ())
+    with pytest.raises(NotImplementedError):
+        engines.check('farfield', ('watch',))
+    with pytest.raises(NotImplementedError):
+        engines.check('', ('chunk_size', 'checkpoint_file'))
+
+
+@pytest.mark.parametrize('ufunc', engines.ENGINES)
+def test_table(ufunc, tmp_path):
+    # compute_Txy accepts exactly the options that the table says the engine
+    # supports
+    if ufunc in ('compiled', 'parallel') and not has_numba:
+        pytest.skip('numba not available')
+    t,x,y = generate_square(3, experiment=0)
+    values = { 'report_n_clipped': True
+             , 'material_tol'    : 1e-3
+             , 'refresh_dT'      : 0.
+             , 'exp_tol'         : 1e-6
+             , 'precision'       : 'mixed'
+             , 'at'              : np.arange(3)
+             , 'chunk_size'      : 17
+             , 'checkpoint_file' : tmp_path / 'T.npy'
+             , 'watch'           : 1e9
+             , 'reductions'      : Reductions(t0=t[0])
+             }
+    assert set(values) == set(engines.SUPPORT)
+    for option, value in values.items():
+        kwargs = {option: value, 'ufunc': ufunc, 'tol': 1e-6 if ufunc == 'farfield' else None}
+        if ufunc in engines.SUPPORT[option]:
+            compute_Txy(t, x, y, T0=300, **kwargs)
+        else:
+            with pytest.raises(NotImplementedError):
+                compute_Txy(t, x, y, T0=300, **kwargs)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_check
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
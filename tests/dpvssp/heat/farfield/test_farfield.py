@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.farfield."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat as heat
+import dpvssp.heat.farfield as farfield
+import dpvssp.heat.material as material
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+
+
+def test_ChebyshevTree():
+    rng = np.random.default_rng(1)
+    md2 = -rng.uniform(0., 1., 1000)
+    tree = farfield.ChebyshevTree(md2, order=8, leaf_size=16)
+    nodes, stop = tree.prefix_nodes(999)
+    assert stop == 992
+    assert [tree.span(*node) for node in nodes][-1][1] == 992
+    s = np.array([0.1, 0.5, 1.0])
+    for level, k in nodes:
+        start, stop = tree.span(level, k)
+        expected = np.exp(np.multiply.outer(s, md2[start:stop])).sum(axis=1)
+        assert np.allclose(tree.evaluate(level, k, s), expected, rtol=1e-8)
+
+
+def test_compute_Txy_farfield():
+    t,x,y = generate_square(20, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    for tol in (1e-1, 1e-3):
+        for tile_size in (None, 256):
+            Tf = compute_Txy(t, x, y, T0=300, ufunc='farfield', tol=tol, tile_size=tile_size)
+            assert np.all(np.abs(Tf - T) <= tol)
+
+
+def test_compute_farfield():
+    # with the default tile size, groups of older pulses are approximated
+    # and the error stays within tol
+    t,x,y = generate_square(20, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    Ethpi32rho, w2 = heat._get_kernel_constants(0, np.float64)
+    pola, polc = material.get_material_polynomials(np.float64)
+    for tol in (1e-1, 1e-4):
+        Tf = np.full(len(x), 300.)
+        n_approximated, n_exact = farfield.compute_farfield( Ethpi32rho, w2, pola, polc
+                                                           , np.arange(len(x)), -(x * x + y * y)
+                                                           , t[1:], Tf, tol
+                                                           )
+        assert n_approximated > 0
+        assert np.all(np.abs(Tf - T) <= tol)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_compute_Txy_farfield
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
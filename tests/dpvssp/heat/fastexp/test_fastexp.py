@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.fastexp."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.fastexp as fastexp
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+from time import perf_counter_ns
+
+
+def test_exp_accuracy():
+    for float_type in (np.float64, np.float32):
+        eps = np.finfo(float_type).eps
+        for tol in (0., 1e-7, 1e-4):
+            degree, relative, ulp = fastexp.error_report(float_type, tol, n=100001)
+            print(f"{float_type.__name__} {tol=} {degree=} {relative=:.2e} {ulp=:.3g}")
+            assert relative <= max(tol, 4 * eps)
+
+
+def test_exp_underflow_and_inplace():
+    for float_type in (np.float64, np.float32):
+        x = np.array([0., -1., -50., fastexp.get_xmin(float_type) - 1., -1e30], dtype=float_type)
+        result = fastexp.exp(x, 1e-7)
+        assert result.dtype == float_type
+        assert np.allclose(result[:3], np.exp(x[:3]), rtol=1e-6, atol=0)
+        assert np.all(result[3:] == 0)
+        fastexp.exp(x, 1e-7, out=x)
+        assert np.array_equal(x, result)
+
+
+def test_compute_Txy_exp_tol():
+    t,x,y = generate_square(10, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    for ufunc in ('', 'fused'):
+        Te = compute_Txy(t, x, y, T0=300, ufunc=ufunc, exp_tol=0.)
+        assert np.allclose(Te, T, rtol=1e-12, atol=0)
+        Te = compute_Txy(t, x, y, T0=300, ufunc=ufunc, exp_tol=1e-4)
+        assert np.allclose(Te, T, rtol=1e-4, atol=0)
+
+
+def test_time_exp():
+    repetitions = 20
+    for n in (10**4, 10**5, 10**6):
+        for float_type in (np.float64, np.float32):
+            x = -np.random.default_rng(1).exponential(3., n).astype(float_type)
+            out = np.empty_like(x)
+            line = f"{float_type.__name__:8} {n=:8}"
+            for tol in (None, 0., 1e-7, 1e-4):
+                fun = (lambda: np.exp(x, out=out)) if tol is None else (lambda: fastexp.exp(x, tol, out=out))
+                fun()
+                runtime = 1e12
+                for r in range(repetitions):
+                    tic = perf_counter_ns()
+                    fun()
+                    runtime = min(runtime, perf_counter_ns() - tic)
+                line += f" | {'np.exp' if tol is None else tol}: {runtime / n:.2f}ns"
+            print(line)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_time_exp
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
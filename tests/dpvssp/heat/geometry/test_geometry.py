@@ -6,6 +6,9 @@ import sys
 sys.path.insert(0,'.')
 
 import dpvssp.heat.geometry as geometry
+import dpvssp.heat.pulsetable as pulsetable
+
+import numpy as np
 
 
 def test_hello_default_arg():
@@ -18,6 +21,67 @@ def test_hello_me():
     assert result == "Hello me!"
 
 
+def _get_toolpaths(float_type=np.float64):
+    return [ geometry.get_hatching(1e-3, 5e-4, 5e-5, float_type=float_type)
+           , geometry.get_hatching(1e-3, 5e-4, 5e-5, angle=np.pi / 6, float_type=float_type)
+           , geometry.get_stripes(1e-3, 1e-3, 2e-4, 5e-5, angle=0.3, float_type=float_type)
+           , geometry.get_chessboard(1e-3, 7e-4, 3e-4, 5e-5, float_type=float_type)
+           , geometry.get_contours(1e-3, 5e-4, 3, 5e-5, float_type=float_type)
+           ]
+
+
+def test_toolpaths():
+    for toolpath in _get_toolpaths():
+        t,x,y = toolpath.get_txy()
+        assert len(t) == len(x) + 1 == len(y) + 1 == toolpath.n_pulses + 1
+        assert np.all(np.abs(x) <= 5e-4 * (1 + 1e-12))
+        assert np.all(np.abs(y) <= 5e-4 * (1 + 1e-12))
+        assert np.allclose(np.diff(t), toolpath.deltat)
+        # pulses are deltax apart along the vectors
+        d = np.hypot(np.diff(x), np.diff(y))
+        assert np.isclose(np.median(d), toolpath.deltax)
+        # no spot is fired twice in a row, e.g. at the corners of contours
+        assert d.min() > 0
+
+
+def test_contours():
+    deltat, deltax = geometry._get_deltat_deltax(0)
+    toolpath = geometry.get_contours(1e-3, 1e-3, 1, 1e-4)
+    t,x,y = toolpath.get_txy()
+    # the corners are fired once, at the start of their outgoing edge
+    assert np.all(np.hypot(np.diff(x), np.diff(y)) > 0)
+    # ... except the end of the last edge, which closes the contour
+    assert np.allclose(toolpath.counts, 1e-3 / deltax + np.array([0, 0, 0, 1]))
+
+
+def test_hatching():
+    toolpath = geometry.get_hatching(1e-3, 5e-4, 5e-5)
+    # 11 lines, scanned in alternating directions
+    assert len(toolpath.vectors) == 11
+    assert np.allclose(toolpath.vectors[0], [-5e-4, -2.5e-4, 5e-4, -2.5e-4])
+    assert np.allclose(toolpath.vectors[1], [5e-4, -2e-4, -5e-4, -2e-4])
+
+
+def test_toolpath_chunks(tmp_path):
+    for float_type in (np.float64, np.float32):
+        for toolpath in _get_toolpaths(float_type):
+            t,x,y = toolpath.get_txy()
+            start = 0
+            for tc, xc, yc in toolpath.chunks(chunk_size=100):
+                assert tc.dtype == xc.dtype == yc.dtype == float_type
+                stop = start + len(xc)
+                assert np.array_equal(tc, t[start:stop + 1])
+                assert np.array_equal(xc, x[start:stop])
+                assert np.array_equal(yc, y[start:stop])
+                start = stop
+            assert start == toolpath.n_pulses
+        toolpath.write(tmp_path / 'contours.pt', chunk_size=100)
+        tm,xm,ym = pulsetable.open_pulse_table(tmp_path / 'contours.pt')
+        assert np.array_equal(tm, t)
+        assert np.array_equal(xm, x)
+        assert np.array_equal(ym, y)
+
+
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (otherwise all tests are normally run with pytest)
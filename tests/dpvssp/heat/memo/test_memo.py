@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.memo."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.memo as memo
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+import pytest
+
+
+def test_compute_Txy(tmp_path):
+    cache = memo.ResultCache(tmp_path)
+    t,x,y = memo.generate_square(5, experiment=0, cache=cache)
+    assert all(isinstance(a, np.memmap) for a in (t, x, y))
+    for a, expected in zip((t, x, y), generate_square(5, experiment=0)):
+        assert np.array_equal(a, expected)
+    T = memo.compute_Txy(t, x, y, T0=300, cache=cache)
+    assert cache.n_misses == 2
+    assert np.array_equal(T, compute_Txy(t, x, y, T0=300))
+    # hits, verbose does not change the result
+    assert np.array_equal(memo.compute_Txy(t, x, y, T0=300, verbose=False, cache=cache), T)
+    memo.generate_square(5, experiment=0, cache=cache)
+    assert cache.n_hits == 2
+    # other inputs or options miss
+    memo.compute_Txy(t, x, y, T0=400, cache=cache)
+    memo.compute_Txy(t, x + 1e-6, y, T0=300, cache=cache)
+    memo.compute_Txy(t, x, y, T0=300, ufunc='fused', cache=cache)
+    assert cache.n_misses == 5
+    with pytest.raises(ValueError):
+        memo.compute_Txy(t, x, y, out=np.empty_like(x), cache=cache)
+
+
+def test_compute_Txy_watch(tmp_path):
+    cache = memo.ResultCache(tmp_path)
+    t,x,y = generate_square(5, experiment=0)
+    T, event = compute_Txy(t, x, y, T0=300, watch=310.)
+    assert event is not None
+    for n_hits in (0, 1):
+        Tm, eventm = memo.compute_Txy(t, x, y, T0=300, watch=310., cache=cache)
+        assert cache.n_hits == n_hits
+        assert eventm == event
+        assert np.array_equal(Tm, T)
+    _, eventm = memo.compute_Txy(t, x, y, T0=300, watch=1e6, cache=cache)
+    assert eventm is None
+    with pytest.raises(ValueError):
+        memo.compute_Txy(t, x, y, T0=300, watch=lambda t, T: T > 600, cache=cache)
+
+
+def test_get_key():
+    # the repr of large arrays is truncated, the data must be hashed
+    at = np.arange(0, 4000, 2)
+    other = at.copy()
+    other[1000] += 1
+    assert memo.get_key('compute_Txy', at=at) != memo.get_key('compute_Txy', at=other)
+    assert memo.get_key('compute_Txy', at=at) == memo.get_key('compute_Txy', at=at.copy())
+    assert memo.get_key('f', n=np.int64(1)) == memo.get_key('f', n=1)
+    with pytest.raises(ValueError):
+        memo.get_key('f', watch=lambda t, T: T > 600)
+
+
+def test_evict(tmp_path):
+    a = np.zeros(1000)
+    cache = memo.ResultCache(tmp_path, max_bytes=int(2.5 * a.nbytes))
+    for k in range(3):
+        cache.put(f'key{k}', a)
+        # key0 is the least recently used
+        cache.get('key0')
+    assert cache.get_size() <= cache.max_bytes
+    assert cache.get('key0') is not None
+    assert cache.get('key1') is None
+    assert cache.get('key2') is not None
+
+
+def test_tiny_cache(tmp_path):
+    # results larger than the cache are returned and kept until the next put
+    cache = memo.ResultCache(tmp_path, max_bytes=100)
+    t,x,y = generate_square(5, experiment=0)
+    T = compute_Txy(t, x, y, T0=300)
+    assert np.array_equal(memo.compute_Txy(t, x, y, T0=300, cache=cache), T)
+    T, event = compute_Txy(t, x, y, T0=300, watch=310.)
+    Tm, eventm = memo.compute_Txy(t, x, y, T0=300, watch=310., cache=cache)
+    assert np.array_equal(Tm, T)
+    assert eventm == event
+    # the previous result was evicted
+    assert len(list(tmp_path.glob('*.npy'))) == 2
+    # evicted by another process between the put and the re-read
+    cache.put = lambda key, result: None
+    assert np.array_equal(memo.compute_Txy(t, x, y, T0=400, cache=cache), compute_Txy(t, x, y, T0=400))
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_compute_Txy
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.pulsetable."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.pulsetable as pulsetable
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
+import pytest
+
+
+def test_roundtrip(tmp_path):
+    for float_type in (np.float64, np.float32):
+        t,x,y = generate_square(5, experiment=0, float_type=float_type)
+        path = tmp_path / f'{float_type.__name__}.pt'
+        pulsetable.write_pulse_table(path, t, x, y, chunk_size=7)
+        assert pulsetable.read_header(path) == (np.dtype(float_type), len(x))
+        tm,xm,ym = pulsetable.open_pulse_table(path)
+        assert tm.dtype is t.dtype
+        assert np.array_equal(tm, t)
+        assert np.array_equal(xm, x)
+        assert np.array_equal(ym, y)
+
+
+def test_not_a_pulse_table(tmp_path):
+    path = tmp_path / 'T.npy'
+    np.save(path, np.zeros(10))
+    with pytest.raises(ValueError):
+        pulsetable.open_pulse_table(path)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_roundtrip
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.reductions."""
+
+import sys
+sys.path.insert(0,'.')
+
+import dpvssp.heat.pulsetable as pulsetable
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat.reductions import Reductions
+
+import numpy as np
+
+
+def _check(r, t, T, threshold, stride):
+    assert r.n == len(T)
+    assert r.T_max == T.max()
+    assert r.t_max == t[1:][np.argmax(T)]
+    above = T > threshold
+    assert r.n_above == np.count_nonzero(above)
+    assert np.isclose(r.time_above, np.diff(t)[above].sum(), rtol=1e-12)
+    assert np.array_equal(r.get_history()[1], T[::stride])
+
+
+def test_update():
+    t = np.linspace(0., 1., 101)
+    T = 300. + 1000. * np.sin(np.pi * t[1:])
+    r = Reductions(t[0], threshold=800., stride=7)
+    for start in range(0, 100, 13):
+        r.update(t[1:][start:start + 13], T[start:start + 13])
+    _check(r, t, T, 800., 7)
+    assert r.n_clipped == np.count_nonzero(T > 1073.)
+
+
+def test_compute_Txy(tmp_path):
+    t,x,y = generate_square(10, experiment=0)
+    pulsetable.write_pulse_table(tmp_path / 'square.pt', t, x, y)
+    tm,xm,ym = pulsetable.open_pulse_table(tmp_path / 'square.pt')
+    T = compute_Txy(t, x, y, T0=300)
+    threshold = 0.5 * (T[0] + T.max())
+    for kwargs in (dict(), dict(tile_size=50)):
+        r = Reductions(t[0], threshold=threshold, stride=7)
+        assert np.array_equal(compute_Txy(t, x, y, T0=300, reductions=r, **kwargs), T)
+        _check(r, t, T, threshold, 7)
+    # only the reductions, from memory mapped inputs
+    r = Reductions(t[0], threshold=threshold, stride=7)
+    assert compute_Txy(tm, xm, ym, T0=300, reductions=r, chunk_size=50) is r
+    _check(r, t, T, threshold, 7)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_update
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
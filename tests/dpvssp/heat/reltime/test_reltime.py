@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for (sub)module dpvssp.heat.reltime."""
+
+import sys
+import tracemalloc
+sys.path.insert(0,'.')
+
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+from dpvssp.heat.reductions import Reductions
+from dpvssp.heat.reltime import RelativeTimes, TimesView
+
+import numpy as np
+
+
+def test_RelativeTimes():
+    # an hour into a job at 100 kHz
+    t = 3600. + 1e-5 * np.arange(5000)
+    assert np.any(np.diff(t.astype(np.float32)) <= 0)
+    rt = RelativeTimes.from_absolute(t, block_size=1000)
+    assert len(rt) == len(t)
+    assert rt.dtype == np.float32
+    assert len(rt.origins) == 5
+    assert np.abs(rt.get_absolute() - t).max() < 1e-9
+    assert np.all(np.diff(rt.get_absolute()) > 0)
+    assert np.array_equal(rt.get_absolute([0, 1234]), rt.get_absolute()[[0, 1234]])
+    assert np.array_equal(rt.get_absolute([-1, 7]), rt.get_absolute()[[-1, 7]])
+    assert np.array_equal(rt.get_absolute(np.s_[4990:]), rt.get_absolute()[4990:])
+    assert rt.get_times(np.s_[10:20]).dtype == np.float32
+
+
+def test_TimesView():
+    t = 3600. + 1e-5 * np.arange(5000)
+    rt = RelativeTimes.from_absolute(t, block_size=1000)
+    for exact, decoded in ((False, rt.get_times()), (True, rt.get_absolute())):
+        view = TimesView(rt, 1, exact=exact)
+        t1 = decoded[1:]
+        assert len(view) == len(t1)
+        assert view.dtype == t1.dtype
+        assert np.array_equal(view[10:2000], t1[10:2000])
+        assert np.array_equal(view[[0, 999, 4998]], t1[[0, 999, 4998]])
+        assert view[-1] == t1[-1]
+        v = np.concatenate((t1[::97], t1[::89] + 1e-6, [0., 1e9]))
+        for side in ('left', 'right'):
+            assert np.array_equal(np.searchsorted(view, v, side=side), np.searchsorted(t1, v, side=side))
+            assert np.searchsorted(view, t1[123], side=side) == np.searchsorted(t1, t1[123], side=side)
+
+
+def test_compute_Txy_relative():
+    t32,x,y = generate_square(10, experiment=0, float_type=np.float32)
+    t,x,y = generate_square(10, experiment=0, float_type=np.float32, relative=True)
+    assert isinstance(t, RelativeTimes)
+    T32 = compute_Txy(t32, x, y, T0=300)
+    T = compute_Txy(t, x, y, T0=300)
+    assert T.dtype == np.float32
+    assert np.allclose(T, T32, rtol=1e-6, atol=0)
+
+    # an hour later, float32 times no longer resolve the pulses
+    t = RelativeTimes(t.origins + 3600., t.deltas, t.block_size)
+    T = compute_Txy(t, x, y, T0=300)
+    t1 = t.get_absolute(np.s_[1:])
+    at = t1[::7]
+    assert np.array_equal(compute_Txy(t, x, y, T0=300, at=at), T[::7])
+    r = Reductions(t0=t1[0])
+    compute_Txy(t, x, y, T0=300, reductions=r, tile_size=64)
+    assert r.t_max == t1[np.argmax(T)]
+
+    # chunk_size: the times are decoded per tile and chunk
+    for tol in (None, 1e-3):
+        expected = compute_Txy(t, x, y, T0=300, tol=tol)
+        assert np.array_equal(compute_Txy(t, x, y, T0=300, tol=tol, chunk_size=100), expected)
+        assert np.array_equal(compute_Txy(t, x, y, T0=300, tol=tol, chunk_size=100, at=at), expected[::7])
+
+    # ... and never all at once: the peak allocation is far below one array
+    # of the times (warm up the caches of the material bounds first)
+    n = 1_000_000
+    t = RelativeTimes.from_absolute(3600. + 1e-5 * np.arange(n + 1))
+    x = np.linspace(0., 1e-2, n, dtype=np.float32)
+    y = np.zeros(n, dtype=np.float32)
+    for tol in (None, 1e-3):
+        compute_Txy(t, x, y, T0=300, tol=tol, chunk_size=100, at=np.arange(10))
+        tracemalloc.start()
+        try:
+            compute_Txy(t, x, y, T0=300, tol=tol, chunk_size=100, at=np.arange(100))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < n * 8 // 8
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (otherwise all tests are normally run with pytest)
+# Make sure that you run this code with the project directory as CWD, and
+# that the source directory is on the path
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_compute_Txy_relative
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print('-*# finished #*-')
+
+# eof
@@ -3,9 +3,14 @@
 """Tests for (sub)module dpvssp.heat."""
 
 import sys
+import tracemalloc
 sys.path.insert(0,'.')
 
 import dpvssp.heat as heat
+import dpvssp.heat.pulsetable as pulsetable
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
 
 
 def test_hello_default_arg():
@@ -18,6 +23,230 @@ def test_hello_me():
     assert result == "Hello me!"
 
 
+def test_compute_Txy_blocked():
+    t,x,y = generate_square(10, experiment=0)
+    T = heat.compute_Txy(t, x, y, T0=300)
+    for ufunc in ('', 'ufunc', 'gufunc', 'afunc', 'fused'):
+        for kwargs in (dict(blocked=True), dict(tile_size=17)):
+            Tb = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, **kwargs)
+            assert np.allclose(Tb, T, rtol=1e-12, atol=0)
+
+
+def test_compute_Txy_parallel():
+    for float_type, rtol in ((np.float64, 1e-12), (np.float32, 1e-6)):
+        t,x,y = generate_square(10, experiment=0, float_type=float_type)
+        T = heat.compute_Txy(t, x, y, T0=300)
+        for n_threads in (None, 1):
+            Tp = heat.compute_Txy(t, x, y, T0=300, ufunc='parallel', n_threads=n_threads)
+            assert Tp.dtype == T.dtype
+            assert np.allclose(Tp, T, rtol=rtol, atol=0)
+
+
+def test_compiled_kernels_float_type():
+    # the kernels must compute in the float type of their arguments
+    t,x,y = generate_square(3, experiment=0, float_type=np.float32)
+    for ufunc in ('compiled', 'parallel'):
+        heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc)
+    heat.compute_Txy_probes(t, x, y, x[:2], y[:2], T0=300, ufunc='parallel')
+    for kernel in (heat._Trise, heat._horner):
+        signatures = kernel.nopython_signatures
+        assert any(str(sig.args[-1]) == 'float32' for sig in signatures)
+        for sig in signatures:
+            assert sig.return_type == sig.args[-1]
+
+
+def test_compute_Txy_compiled():
+    for float_type, rtol in ((np.float64, 1e-12), (np.float32, 1e-6)):
+        t,x,y = generate_square(10, experiment=0, float_type=float_type)
+        T = heat.compute_Txy(t, x, y, T0=300)
+        for kwargs in (dict(), dict(tile_size=17), dict(chunk_size=17)):
+            Tc = heat.compute_Txy(t, x, y, T0=300, ufunc='compiled', **kwargs)
+            assert Tc.dtype == T.dtype
+            assert np.allclose(Tc, T, rtol=rtol, atol=0)
+
+
+def test_compute_Txy_refresh_dT():
+    t,x,y = generate_square(10, experiment=0)
+    T = heat.compute_Txy(t, x, y, T0=300)
+    for ufunc in ('', 'gufunc'):
+        Tr = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, refresh_dT=0., tile_size=100)
+        assert np.allclose(Tr, T, rtol=1e-12, atol=0)
+    # the material parameters vary slowly, the error is much smaller than dT
+    stats = {}
+    Tr = heat.compute_Txy(t, x, y, T0=300, refresh_dT=1., stats=stats)
+    assert np.abs(Tr - T).max() < 1.
+    # every (pulse, time) pair is counted once, and most are skipped
+    n = len(x) * (len(x) + 1) // 2
+    assert stats['n_material_evaluated'] + stats['n_material_skipped'] == n
+    assert stats['n_material_skipped'] > stats['n_material_evaluated']
+
+
+def test_compute_Txy_mixed():
+    t,x,y = generate_square(10, experiment=0)
+    T = heat.compute_Txy(t, x, y, T0=300)
+    T32 = heat.compute_Txy(t.astype(np.float32), x.astype(np.float32), y.astype(np.float32), T0=300)
+    for ufunc in ('', 'fused'):
+        Tm = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, precision='mixed')
+        assert Tm.dtype == np.float64
+        assert np.abs(Tm - T).max() < np.abs(T32 - T).max()
+        assert np.allclose(Tm, T, rtol=1e-6, atol=0)
+
+
+def test_compute_Txy_probes():
+    t,x,y = generate_square(10, experiment=0)
+    dx = x[1] - x[0]
+    xp = np.array([0., 3 * dx, -5 * dx])
+    yp = np.array([0., dx, 12 * dx])
+    expected = np.array([heat.compute_Txy(t, x, y, T0=300, xc=xc, yc=yc) for xc, yc in zip(xp, yp)])
+    for ufunc in ('', 'ufunc', 'parallel'):
+        T = heat.compute_Txy_probes(t, x, y, xp, yp, T0=300, ufunc=ufunc)
+        assert T.shape == (3, len(x))
+        assert np.allclose(T, expected, rtol=1e-12, atol=0)
+
+
+def test_HeatAccumulator():
+    t,x,y = generate_square(10, experiment=0)
+    xc = 3 * (x[1] - x[0])
+    for tol in (None, 1e-4):
+        T = heat.compute_Txy(t, x, y, T0=300, xc=xc, tol=tol)
+        accumulator = heat.HeatAccumulator(t[0], T0=300, xc=xc, tol=tol)
+        batches = np.s_[0:1], np.s_[1:100], np.s_[100:101], np.s_[101:len(x)]
+        Ta = np.concatenate([accumulator.push(t[1:][b], x[b], y[b]) for b in batches])
+        assert np.allclose(Ta, T, rtol=1e-12, atol=0)
+        assert accumulator.n_pulses == len(x)
+
+
+def test_HeatAccumulator_window():
+    t,x,y = generate_square(10, experiment=0)
+    xc = 3 * (x[1] - x[0])
+    T = heat.compute_Txy(t, x, y, T0=300, xc=xc)
+    for ufunc in ('', 'parallel'):
+        # one large batch is trimmed inside push
+        accumulator = heat.HeatAccumulator(t[0], T0=300, xc=xc, window=50, ufunc=ufunc)
+        Tw = accumulator.push(t[1:], x, y)
+        assert len(accumulator.md2) <= 50
+        assert 0 < np.abs(Tw - T).max() <= accumulator.window_error
+        # independent of the batching
+        accumulator = heat.HeatAccumulator(t[0], T0=300, xc=xc, window=50, ufunc=ufunc)
+        batches = np.s_[0:1], np.s_[1:30], np.s_[30:200], np.s_[200:len(x)]
+        Ta = np.concatenate([accumulator.push(t[1:][b], x[b], y[b]) for b in batches])
+        assert np.allclose(Ta, Tw, rtol=1e-12, atol=0)
+        # a window that holds all pulses is exact
+        accumulator = heat.HeatAccumulator(t[0], T0=300, xc=xc, window=len(x), ufunc=ufunc)
+        assert np.allclose(accumulator.push(t[1:], x, y), T, rtol=1e-12, atol=0)
+        assert accumulator.window_error == 0.
+
+
+def test_compute_Txy_sweep():
+    t,x,y = generate_square(10, experiment=0)
+    xc = 2 * (x[1] - x[0])
+    experiments = [0, 1, 0]
+    T0 = [300., 300., 500.]
+    expected = np.array([heat.compute_Txy(t, x, y, T0=T0_b, experiment=experiment, xc=xc)
+                         for experiment, T0_b in zip(experiments, T0)])
+    for ufunc in ('', 'ufunc'):
+        for kwargs in (dict(), dict(tile_size=50)):
+            T = heat.compute_Txy_sweep(t, x, y, T0=T0, experiments=experiments, xc=xc, ufunc=ufunc, **kwargs)
+            assert T.shape == (3, len(x))
+            assert np.allclose(T, expected, rtol=1e-12, atol=0)
+
+
+def test_compute_Txy_chunked(tmp_path):
+    t,x,y = generate_square(10, experiment=0)
+    pulsetable.write_pulse_table(tmp_path / 'square.pt', t, x, y)
+    tm,xm,ym = pulsetable.open_pulse_table(tmp_path / 'square.pt')
+    for kwargs in (dict(), dict(tol=1e-4), dict(ufunc='fused')):
+        T = heat.compute_Txy(t, x, y, T0=300, **kwargs)
+        out = np.lib.format.open_memmap(tmp_path / 'T.npy', mode='w+', dtype=t.dtype, shape=(len(x),))
+        Tc = heat.compute_Txy(tm, xm, ym, T0=300, out=out, chunk_size=50, **kwargs)
+        assert Tc is out
+        assert np.allclose(Tc, T, rtol=1e-12, atol=0)
+
+
+def test_compute_Txy_at():
+    t,x,y = generate_square(10, experiment=0)
+    at = np.array([0, 5, 100, 101, len(x) - 1])
+    for ufunc in ('', 'ufunc', 'gufunc', 'afunc', 'fused', 'compiled', 'parallel'):
+        for kwargs in (dict(tile_size=2), dict(tol=1e-4)):
+            T = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, **kwargs)
+            assert np.array_equal(heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, at=at, **kwargs), T[at])
+        T = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc)
+        assert np.array_equal(heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, at=at), T[at])
+        # times instead of indices
+        assert np.array_equal(heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, at=t[1:][at]), T[at])
+
+
+def test_compute_Txy_watch():
+    t,x,y = generate_square(10, experiment=0)
+    T = heat.compute_Txy(t, x, y, T0=300)
+    threshold = 0.5 * (T[0] + T.max())
+    for ufunc in ('', 'fused'):
+        for kwargs in (dict(tile_size=17), dict(chunk_size=17), dict(at=np.arange(1, len(x), 2))):
+            Tw, event = heat.compute_Txy(t, x, y, T0=300, ufunc=ufunc, watch=threshold, **kwargs)
+            Texpected = T[kwargs['at']] if 'at' in kwargs else T
+            assert event == np.flatnonzero(Texpected > threshold)[0]
+            assert np.allclose(Tw, Texpected[:event + 1], rtol=1e-12, atol=0)
+    # no event, callable condition
+    Tw, event = heat.compute_Txy(t, x, y, T0=300, watch=lambda t, T: T > 2 * T.max() + 1e6)
+    assert event is None
+    assert np.allclose(Tw, T, rtol=1e-12, atol=0)
+
+
+def test_compute_field():
+    t,x,y = generate_square(10, experiment=0)
+    t_eval = t[len(x) // 2]
+    gx = np.linspace(x.min(), x.max(), 7)
+    gy = np.linspace(y.min(), y.max(), 5)
+    # brute force, material parameters at T0
+    Ethpi32rho, w2 = heat._get_kernel_constants(0, np.float64)
+    pola, polc = heat.material.get_material_polynomials(np.float64)
+    a4dt = 4 * pola(300.) * t_eval
+    D = a4dt + w2
+    fired = t[:len(x)] < t_eval
+    expected = np.array([[ 300. + Ethpi32rho / polc(300.) / (np.sqrt(a4dt) * D)
+                                 * np.exp(-((xg - x[fired])**2 + (yg - y[fired])**2) / D).sum()
+                           for yg in gy
+                         ] for xg in gx
+                        ])
+    T = heat.compute_field(t_eval, x, y, (gx, gy), t=t, T0=300)
+    assert T.shape == (7, 5)
+    assert np.allclose(T, expected, rtol=1e-12, atol=0)
+    T = heat.compute_field(t_eval, x, y, (gx, gy), t=t, T0=300, method='gridded')
+    assert np.allclose(T - 300, expected - 300, rtol=1e-2, atol=0)
+    # no pulse fired yet
+    T = heat.compute_field(t[0], x, y, (gx, gy), t=t, T0=300, method='gridded')
+    assert np.array_equal(T, np.full((7, 5), 300.))
+    # scattered pulses: W is not n_pulses x n_pulses
+    rng = np.random.default_rng(1)
+    xs = rng.uniform(x.min(), x.max(), 200000)
+    ys = rng.uniform(y.min(), y.max(), 200000)
+    T = heat.compute_field(t_eval, xs, ys, (gx, gy), T0=300)
+    Tg = heat.compute_field(t_eval, xs, ys, (gx, gy), T0=300, method='gridded')
+    assert np.array_equal(T, Tg)
+
+
+def test_compute_field_tiles(monkeypatch):
+    t,x,y = generate_square(10, experiment=0)
+    gx = np.linspace(x.min(), x.max(), 50)
+    gy = np.linspace(y.min(), y.max(), 40)
+    T = heat.compute_field(t[-1], x, y, (gx, gy), T0=300, method='gridded')
+    monkeypatch.setattr(heat, 'FIELD_TILE', 3)
+    Tt = heat.compute_field(t[-1], x, y, (gx, gy), T0=300, method='gridded')
+    assert np.allclose(Tt, T, rtol=1e-12, atol=0)
+    monkeypatch.undo()
+    # a 5 cm part: the auxiliary lattice would have billions of nodes
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(-2.5e-2, 2.5e-2, (2, 500))
+    g = np.linspace(-2.5e-2, 2.5e-2, 100)
+    tracemalloc.start()
+    try:
+        heat.compute_field(1e-3, xs, ys, (g, g), T0=300, method='gridded')
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 10 * 2**20
+
+
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (otherwise all tests are normally run with pytest)
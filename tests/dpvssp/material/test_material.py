@@ -6,6 +6,10 @@ import sys
 sys.path.insert(0,'.')
 
 import dpvssp.heat.material as material
+from dpvssp.heat import compute_Txy
+from dpvssp.heat.geometry import generate_square
+
+import numpy as np
 
 
 def test_hello_default_arg():
@@ -18,6 +22,25 @@ def test_hello_me():
     assert result == "Hello me!"
 
 
+def test_get_material_tables():
+    for float_type in (np.float64, np.float32):
+        pols = material.get_material_polynomials(float_type)
+        tabs = material.get_material_tables(float_type, 1e-5)
+        assert material.get_material_tables(float_type, 1e-5) is tabs
+        T = np.linspace(material.T_MIN, material.T_MAX, 10001).astype(float_type)
+        for pol, tab in zip(pols, tabs):
+            result = tab(T)
+            assert result.dtype == float_type
+            assert np.all(np.abs(result - pol(T)) <= 1e-5 * np.abs(pol(T)))
+
+
+def test_compute_Txy_material_tol():
+    t,x,y = generate_square(10, experiment=0)
+    T  = compute_Txy(t, x, y, T0=300)
+    Tm = compute_Txy(t, x, y, T0=300, material_tol=1e-6)
+    assert np.allclose(Tm, T, rtol=1e-5, atol=0)
+
+
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (otherwise all tests are normally run with pytest)